@@ -1,8 +1,16 @@
-from asana_typed.query import Query
+from asana_typed.query import Query, Predicate
+from asana_typed.query_cache import QueryCache
 from asana_typed.asana import Resource, WorkSpace, Photo, User, \
-    Tag, Membership, Task, ProjectStatus, Project
+    Tag, Membership, Task, ProjectStatus, Project, Story, SubtaskTree
 
-from asana_typed.asana import task_from_dict
+from asana_typed.asana import task_from_dict, register_resource, fetch_resource, fetch_resource_async
+from asana_typed.hedging import Deadline, DeadlineExceeded
+from asana_typed.export import WorkspaceExporter
+from asana_typed.pagination import PrefetchPageIterator, paginate
+from asana_typed.store import LocalStore
+from asana_typed.revalidate import find_stale, probe_modified_at
+from asana_typed.search import search_tasks
+from asana_typed.sync import SyncEngine, AsanaEventSource, FakeEventSource, MemoryMirror
 
 from ._version import get_versions
 
@@ -0,0 +1,118 @@
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+AGGREGATIONS = ('count', 'sum', 'min', 'max', 'mean')
+
+Aggregation = Union[str, Tuple[str, Union[str, Callable[[Any], Any]]]]
+
+
+def group_key(attribute: Union[str, Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    """
+    getter of a grouping key, a dotted path yields None when an object along it is None, e.g. assignee.gid
+    of an unassigned task
+    """
+    if not isinstance(attribute, str):
+        return attribute
+    if '.' not in attribute:
+        return attrgetter(attribute)
+    parts = attribute.split('.')
+
+    def key(x):
+        for part in parts:
+            if x is None:
+                return None
+            x = getattr(x, part)
+        return x
+
+    return key
+
+
+def _specs(aggregations: Dict[str, Aggregation]) -> List[Tuple[str, str, Optional[Callable[[Any], Any]]]]:
+    specs = []
+    for name, aggregation in aggregations.items():
+        function, attribute = (aggregation, None) if isinstance(aggregation, str) else aggregation
+        if function not in AGGREGATIONS:
+            raise ValueError("Unknown aggregation {}, use one of {}".format(function, ', '.join(AGGREGATIONS)))
+        if function != 'count' and attribute is None:
+            raise ValueError("Aggregation {} of {} needs an attribute".format(function, name))
+        getter = attrgetter(attribute) if isinstance(attribute, str) else attribute
+        specs.append((name, function, getter))
+    return specs
+
+
+def aggregate(items: Iterable, aggregations: Dict[str, Aggregation],
+              key: Optional[Callable[[Any], Any]] = None) -> Dict[Any, Dict[str, Any]]:
+    """
+    compute aggregations in a single pass without keeping the items. None and datetime.min values are skipped,
+    sum of nothing is 0, min, max and mean of nothing are None.
+    :param items: iterable of objects
+    :param aggregations: result name to 'count' or (function, attribute), function one of count, sum, min, max, mean
+    :param key: group items by it, all items form one group under None if not given
+    :return: group key to result name to value
+    """
+    specs = _specs(aggregations)
+    initial = [[0, 0] if function in ('count', 'sum', 'mean') else [None] for _, function, _ in specs]
+    # without a key the single group exists even if there are no items
+    groups = {} if key is not None else {None: [list(state) for state in initial]}
+    for item in items:
+        group = key(item) if key is not None else None
+        states = groups.get(group)
+        if states is None:
+            states = groups[group] = [list(state) for state in initial]
+        for state, (_, function, getter) in zip(states, specs):
+            if function == 'count':
+                state[0] += 1
+                continue
+            value = getter(item)
+            if value is None or (type(value) is datetime and value == datetime.min):
+                continue
+            if function == 'min':
+                if state[0] is None or value < state[0]:
+                    state[0] = value
+            elif function == 'max':
+                if state[0] is None or value > state[0]:
+                    state[0] = value
+            else:
+                state[0] += value
+                state[1] += 1
+    results = {}
+    for group, states in groups.items():
+        result = results[group] = {}
+        for state, (name, function, _) in zip(states, specs):
+            if function == 'mean':
+                result[name] = state[0] / state[1] if state[1] else None
+            else:
+                result[name] = state[0]
+    return results
+
+
+class Groups(dict):
+    """
+    Result of Query.group_by, a dict of group key to the matching items in query order.
+    agg computes aggregates per group, Query.aggregate(by=...) does the same without collecting the members.
+    """
+
+    def __init__(self, items: Iterable, key: Callable[[Any], Any]):
+        """
+        :param items: matching items in query order
+        :param key: group key of an item
+        """
+        super(Groups, self).__init__()
+        for item in items:
+            group = key(item)
+            members = self.get(group)
+            if members is None:
+                self[group] = [item]
+            else:
+                members.append(item)
+
+    def agg(self, **aggregations: Aggregation) -> Dict[Any, Dict[str, Any]]:
+        """
+        e.g. agg(tasks='count', done=('sum', 'completed'), latest=('max', 'modified_at'))
+        :return: group key to aggregation name to value
+        """
+        return {group: aggregate(members, aggregations)[None] for group, members in self.items()}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} groups:{len(self)}"
@@ -1,10 +1,21 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, List, TypeVar, Callable, Type, cast, Optional
+from typing import Any, List, TypeVar, Callable, Type, cast, Optional, Dict, Tuple, Union
 
 import dateutil.parser
 
+from asana_typed.hedging import Deadline, as_deadline, hedged_call, latency_tracker
+from asana_typed.instrumentation import instrumented, span
+from asana_typed.pagination import paginate
+from asana_typed.singleflight import SingleFlight, AsyncSingleFlight
+
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
 
 class MissingKey(Exception):
     pass
@@ -93,32 +104,28 @@ class Resource(BaseRep):
         return result
 
     def fetch(self, client):
-        try:
-            return getattr(self, "__fetch__{}__".format(self.resource_type))(client)
-        except AttributeError:
-            print('Make Fetching method for {}'.format(self.resource_type))
-            t = getattr(client, self.resource_type + 's')
-            if t is not None:
-                return t.find_by_id(self.gid)
-        raise Exception("Unknown Resource Type " + self.resource_type)
+        return fetch_resource(client, self.resource_type, self.gid)
+
+    async def fetch_async(self, client, executor=None):
+        return await fetch_resource_async(client, self.resource_type, self.gid, executor)
 
     def __fetch__follower__(self, client):
-        return self.__fetch__user__(client)
+        return fetch_resource(client, 'follower', self.gid)
 
     def __fetch__user__(self, client):
-        return User.from_dict(client.users.find_by_id(self.gid))
+        return fetch_resource(client, 'user', self.gid)
 
     def __fetch__workspace__(self, client):
-        return WorkSpace.from_dict(client.workspaces.find_by_id(self.gid))
+        return fetch_resource(client, 'workspace', self.gid)
 
     def __fetch__tag__(self, client):
-        return Tag.from_dict(client.tags.find_by_id(self.gid))
+        return fetch_resource(client, 'tag', self.gid)
 
     def __fetch__project__(self, client):
-        return Project.from_dict(client.projects.find_by_id(self.gid))
+        return fetch_resource(client, 'project', self.gid)
 
     def __fetch__task__(self, client):
-        return Task.from_dict(client.tasks.find_by_id(self.gid))
+        return fetch_resource(client, 'task', self.gid)
 
 
 workspace_required_keys = {'gid', 'email_domains', 'is_organization', 'name', 'resource_type'}
@@ -141,6 +148,7 @@ class WorkSpace(BaseRep):
         self.resource_type = resource_type
 
     @staticmethod
+    @instrumented('workspace.from_dict')
     def from_dict(obj: Any) -> 'WorkSpace':
         assert isinstance(obj, dict)
         gid = from_str(obj.get("gid"))
@@ -150,6 +158,7 @@ class WorkSpace(BaseRep):
         resource_type = from_str(obj.get("resource_type"))
         return WorkSpace(gid, email_domains, is_organization, name, resource_type)
 
+    @instrumented('workspace.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
@@ -202,7 +211,7 @@ class User(BaseRep):
     gid: str
     email: str
     name: str
-    photo: Photo
+    photo: Optional[Photo]
     resource_type: str
     workspaces: List[Resource]
 
@@ -216,6 +225,7 @@ class User(BaseRep):
         self.workspaces = workspaces
 
     @staticmethod
+    @instrumented('user.from_dict')
     def from_dict(obj: Any) -> 'User':
         assert isinstance(obj, dict)
         set_keys = user_required_keys.difference(set(obj.keys()))
@@ -225,17 +235,18 @@ class User(BaseRep):
         gid = from_str(obj.get("gid"))
         email = from_str(obj.get("email"))
         name = from_str(obj.get("name"))
-        photo = Photo.from_dict(obj.get("photo"))
+        photo = from_union([Photo.from_dict, from_none], obj.get("photo"))
         resource_type = from_str(obj.get("resource_type"))
         workspaces = from_list(Resource.from_dict, obj.get("workspaces"))
-        return User(id, gid, email, name, photo, resource_type, workspaces)
+        return User(gid, email, name, photo, resource_type, workspaces)
 
+    @instrumented('user.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
         result["email"] = from_str(self.email)
         result["name"] = from_str(self.name)
-        result["photo"] = to_class(Photo, self.photo)
+        result["photo"] = from_union([lambda x: to_class(Photo, x), from_none], self.photo)
         result["resource_type"] = from_str(self.resource_type)
         result["workspaces"] = from_list(lambda x: to_class(Resource, x), self.workspaces)
         return result
@@ -276,6 +287,7 @@ class Tag(BaseRep):
         self.workspace = workspace
 
     @staticmethod
+    @instrumented('tag.from_dict')
     def from_dict(obj: Any) -> 'Tag':
         assert isinstance(obj, dict)
         set_keys = tag_required_keys.difference(set(obj.keys()))
@@ -292,6 +304,7 @@ class Tag(BaseRep):
         workspace = Resource.from_dict(obj.get("workspace"))
         return Tag(gid, color, created_at, followers, name, notes, resource_type, workspace)
 
+    @instrumented('tag.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
@@ -350,6 +363,7 @@ class Story(BaseRep):
         self.type_ = type_
 
     @staticmethod
+    @instrumented('story.from_dict')
     def from_dict(obj: Any) -> 'Story':
         assert isinstance(obj, dict)
         gid = from_str(obj.get("gid"))
@@ -361,6 +375,7 @@ class Story(BaseRep):
         type = from_str(obj.get("type"))
         return Story(gid, created_at, created_by, resource_subtype, resource_type, text, type)
 
+    @instrumented('story.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
@@ -378,10 +393,15 @@ task_required_keys = {'gid', 'assignee', 'assignee_status', 'completed', 'comple
                       'name', 'notes', 'num_hearts', 'num_likes', 'parent', 'projects', 'resource_type', 'start_on',
                       'tags', 'resource_subtype', 'workspace'}
 
+# opt_fields returning complete task payloads from collection endpoints, which otherwise only list compact tasks
+task_opt_fields = sorted(task_required_keys) + ['assignee.name', 'followers.name', 'memberships.project.name',
+                                                'memberships.section.name', 'parent.name', 'projects.name',
+                                                'tags.name', 'workspace.name']
+
 
 class Task(BaseRep):
     gid: str
-    assignee: Resource
+    assignee: Optional[Resource]
     assignee_status: str
     completed: bool
     completed_at: Optional[datetime]
@@ -442,6 +462,7 @@ class Task(BaseRep):
         self.workspace = workspace
 
     @staticmethod
+    @instrumented('task.from_dict')
     def from_dict(obj: Any) -> 'Task':
         assert isinstance(obj, dict)
         set_keys = task_required_keys.difference(set(obj.keys()))
@@ -449,7 +470,7 @@ class Task(BaseRep):
             raise MissingKey(
                 f"Following keys are missing:\n{', '.join(list(set_keys))}")
         gid = from_str(obj.get("gid"))
-        assignee = Resource.from_dict(obj.get("assignee"))
+        assignee = from_union([Resource.from_dict, from_none], obj.get("assignee"))
         assignee_status = from_str(obj.get("assignee_status"))
         completed = from_bool(obj.get("completed"))
         completed_at = from_union([from_datetime, from_none], obj.get("completed_at"))
@@ -478,10 +499,11 @@ class Task(BaseRep):
                     hearted, hearts, liked, likes, memberships, modified_at, name, notes, num_hearts, num_likes, parent,
                     projects, resource_type, start_on, tags, resource_subtype, workspace)
 
+    @instrumented('task.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
-        result["assignee"] = to_class(Resource, self.assignee)
+        result["assignee"] = from_union([lambda x: to_class(Resource, x), from_none], self.assignee)
         result["assignee_status"] = from_str(self.assignee_status)
         result["completed"] = from_bool(self.completed)
         result["completed_at"] = from_union([lambda x: x.isoformat(), from_none], self.completed_at)
@@ -509,8 +531,116 @@ class Task(BaseRep):
         result["workspace"] = to_class(Resource, self.workspace)
         return result
 
-    def fetch_stories(self, client):
-        return map(lambda x: Story.from_dict(x), client.tasks.stories(self.gid))
+    def fetch_stories(self, client, page_size: int = 100, prefetch: int = 1, store=None):
+        """
+        lazily fetch the stories of this task, the next pages are requested while the current one is decoded.
+        With a store only stories newer than the high-water mark recorded by the previous run are returned,
+        and tasks whose modified_at did not move since then are not requested at all. The mark is updated
+        once the iterator is exhausted.
+        :param client: asana client
+        :param page_size: stories per page
+        :param prefetch: pages fetched ahead of the consumer, 0 disables the background fetch
+        :param store: LocalStore keeping the per task high-water mark
+        :return: iterator of Story
+        """
+        stories = paginate(client, '/tasks/{}/stories'.format(self.gid), decoder=Story.from_dict,
+                           page_size=page_size, prefetch=prefetch)
+        if store is None:
+            return stories
+        return self._new_stories(stories, store)
+
+    def _new_stories(self, stories, store):
+        mark = store.get_story_mark(self.gid)
+        if mark is not None and mark[2] == self.modified_at:
+            return
+        newest = _story_order(mark[0], mark[1]) if mark is not None and mark[0] is not None else None
+        latest = newest
+        for story in stories:
+            order = _story_order(story.gid, story.created_at)
+            if newest is not None and order <= newest:
+                continue
+            if latest is None or order > latest:
+                latest = order
+            yield story
+        store.set_story_mark(self.gid, latest[2] if latest else None, latest[0] if latest else None,
+                             self.modified_at)
+
+    def fetch_subtasks(self, client) -> List['Task']:
+        """
+        fetch and decode the direct subtasks of this task
+        """
+        return list(paginate(client, '/tasks/{}/subtasks'.format(self.gid), decoder=Task.from_dict, prefetch=0,
+                             fields=task_opt_fields))
+
+    def fetch_subtree(self, client, max_depth: int = 10, max_concurrency: int = 8) -> 'SubtaskTree':
+        """
+        load the subtask tree below this task breadth first, the subtasks of every task on a level
+        are fetched concurrently as complete payloads and decoded page by page
+        :param client: asana client
+        :param max_depth: levels of subtasks expanded
+        :param max_concurrency: concurrent subtask listings
+        :return: SubtaskTree rooted at this task
+        """
+        tree = SubtaskTree(self)
+        level = [self]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for _ in range(max_depth):
+                next_level = []
+                for parent, subtasks in zip(level, executor.map(lambda t: t.fetch_subtasks(client), level)):
+                    next_level.extend(tree.add(parent, subtasks))
+                if not next_level:
+                    break
+                level = next_level
+        return tree
+
+
+def _story_order(gid: str, created_at: datetime) -> Tuple[datetime, int, str]:
+    # gids are numeric strings growing over time, comparing length first orders them numerically
+    return created_at, len(gid), gid
+
+
+class SubtaskTree(object):
+    """
+    Tasks of a subtask tree indexed by gid with parent/child links
+    """
+
+    def __init__(self, root: Task):
+        self.root = root
+        self.tasks: Dict[str, Task] = {root.gid: root}
+        self.children: Dict[str, List[str]] = {root.gid: []}
+        self.parents: Dict[str, str] = {}
+
+    def add(self, parent: Task, subtasks: List[Task]) -> List[Task]:
+        """
+        link subtasks below parent
+        :return: subtasks not seen before
+        """
+        added = []
+        for subtask in subtasks:
+            if subtask.gid in self.tasks:
+                continue
+            self.tasks[subtask.gid] = subtask
+            self.children[subtask.gid] = []
+            self.children[parent.gid].append(subtask.gid)
+            self.parents[subtask.gid] = parent.gid
+            added.append(subtask)
+        return added
+
+    def subtasks_of(self, gid: str) -> List[Task]:
+        return [self.tasks[child] for child in self.children.get(gid, [])]
+
+    def depth_of(self, gid: str) -> int:
+        depth = 0
+        while gid in self.parents:
+            gid = self.parents[gid]
+            depth += 1
+        return depth
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} root:{self.root.gid} tasks:{len(self.tasks)}"
 
 
 def task_from_dict(s: Any) -> Task:
@@ -548,6 +678,7 @@ class ProjectStatus:
         self.text = text
 
     @staticmethod
+    @instrumented('project_status.from_dict')
     def from_dict(obj: Any) -> 'ProjectStatus':
         assert isinstance(obj, dict)
         if project_status_required_keys.difference(set(obj.keys())).__len__() > 0:
@@ -564,6 +695,7 @@ class ProjectStatus:
         text = from_str(obj.get("text"))
         return ProjectStatus(gid, author, color, created_at, created_by, modified_at, resource_type, text)
 
+    @instrumented('project_status.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
@@ -633,13 +765,15 @@ class Project(BaseRep):
         self.workspace = workspace
 
     @staticmethod
+    @instrumented('project.from_dict')
     def from_dict(obj: Any) -> 'Project':
         assert isinstance(obj, dict)
         gid = from_str(obj.get("gid"))
         archived = from_bool(obj.get("archived"))
         color = from_union([from_str, from_none], obj.get("color"))
         created_at = from_datetime(obj.get("created_at"))
-        current_status = from_union([ProjectStatus.from_dict, from_none], obj.get("current_status"))
+        # from_none first, so projects without a status never record a failed project_status.from_dict
+        current_status = from_union([from_none, ProjectStatus.from_dict], obj.get("current_status"))
         due_date = from_union([from_datetime, from_none], obj.get("due_date"))
         followers = from_union([lambda x: from_list(Resource.from_dict, x), from_none], obj.get("followers"))
         layout = from_union([from_str, from_none], obj.get("layout"))
@@ -656,13 +790,14 @@ class Project(BaseRep):
         return Project(gid, archived, color, created_at, current_status, due_date, followers, layout, members,
                        modified_at, name, notes, owner, public, resource_type, start_on, team, workspace)
 
+    @instrumented('project.to_dict')
     def to_dict(self) -> dict:
         result: dict = {}
         result["gid"] = from_str(self.gid)
         result["archived"] = from_bool(self.archived)
         result["color"] = from_union([from_str, from_none], self.color)
         result["created_at"] = from_union([lambda x: x.isoformat(), from_none], self.created_at)
-        result["current_status"] = from_none(self.current_status)
+        result["current_status"] = from_union([lambda x: to_class(ProjectStatus, x), from_none], self.current_status)
         result["due_date"] = from_union([lambda x: x.isoformat(), from_none], self.due_date)
         result["followers"] = from_union([lambda x: from_list(lambda x: to_class(Resource, x), x), from_none],
                                          self.followers)
@@ -687,3 +822,97 @@ def project_from_dict(s: Any) -> Project:
 
 def project_to_dict(x: Project) -> Any:
     return to_class(Project, x)
+
+
+resource_registry: Dict[str, Tuple[str, Type]] = {}
+_unregistered_types = set()
+
+
+def register_resource(resource_type: str, endpoint: str, model: Type = Resource) -> None:
+    """
+    register how a resource type is fetched and decoded
+    :param resource_type: value of resource_type in the api payload, e.g. section
+    :param endpoint: name of the client attribute providing find_by_id, e.g. sections
+    :param model: class providing from_dict, defaults to the compact Resource
+    """
+    resource_registry[resource_type] = (endpoint, model)
+
+
+register_resource('user', 'users', User)
+register_resource('follower', 'users', User)
+register_resource('workspace', 'workspaces', WorkSpace)
+register_resource('tag', 'tags', Tag)
+register_resource('project', 'projects', Project)
+register_resource('project_status', 'project_statuses', ProjectStatus)
+register_resource('task', 'tasks', Task)
+register_resource('story', 'stories', Story)
+register_resource('section', 'sections')
+register_resource('team', 'teams')
+register_resource('attachment', 'attachments')
+
+
+def resolve_resource_type(resource_type: str) -> Tuple[str, Type]:
+    """
+    look up the endpoint and model for a resource type, unregistered types fall back to
+    the pluralised endpoint decoded as a compact Resource
+    """
+    entry = resource_registry.get(resource_type)
+    if entry is not None:
+        return entry
+    if resource_type not in _unregistered_types:
+        _unregistered_types.add(resource_type)
+        logger.warning("No model registered for resource type %s, decoding as Resource", resource_type)
+    return resource_type + 's', Resource
+
+
+_fetch_flights = SingleFlight()
+_async_fetch_flights = AsyncSingleFlight()
+
+
+def _fetch_uncoalesced(client, endpoint: str, model: Type, gid: str):
+    api = getattr(client, endpoint, None)
+    if api is None:
+        raise Exception("Unknown Resource Type " + endpoint)
+    with span('fetch.' + endpoint) as s:
+        s.count = 1
+        start = time.perf_counter()
+        data = api.find_by_id(gid)
+        latency_tracker.record(endpoint, time.perf_counter() - start)
+        return model.from_dict(data)
+
+
+def _fetch_hedged(client, endpoint: str, model: Type, gid: str, hedge: bool):
+    delay = latency_tracker.hedge_delay(endpoint) if hedge else None
+    return hedged_call(_fetch_uncoalesced, (client, endpoint, model, gid), delay)
+
+
+def fetch_resource(client, resource_type: str, gid: str, deadline: Union[Deadline, float, None] = None,
+                   hedge: bool = False):
+    """
+    fetch a single object by gid and decode it into its registered model.
+    Concurrent calls for the same object share a single request and the same decoded object.
+    :param client: asana client
+    :param resource_type: resource type of the object
+    :param gid: gid of the object
+    :param deadline: Deadline or budget in seconds, DeadlineExceeded is raised once it passes
+    :param hedge: send a duplicate request once the call is slower than the endpoint's p95 latency
+    :return: decoded object
+    """
+    endpoint, model = resolve_resource_type(resource_type)
+    key = (id(client), endpoint, gid)
+    deadline = as_deadline(deadline)
+    if deadline is None and not hedge:
+        return _fetch_flights.do(key, _fetch_uncoalesced, client, endpoint, model, gid)
+    # the shared request runs without a deadline, each caller only bounds its own wait on it
+    timeout = deadline.remaining() if deadline is not None else None
+    return _fetch_flights.do_within(key, timeout, _fetch_hedged, client, endpoint, model, gid, hedge)
+
+
+async def fetch_resource_async(client, resource_type: str, gid: str, executor=None):
+    """
+    asyncio variant of fetch_resource, the blocking client runs in executor
+    """
+    loop = asyncio.get_event_loop()
+    endpoint, model = resolve_resource_type(resource_type)
+    return await _async_fetch_flights.do((id(client), endpoint, gid), loop.run_in_executor, executor,
+                                         fetch_resource, client, resource_type, gid)
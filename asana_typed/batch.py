@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from asana_typed.asana import resolve_resource_type, fetch_resource
+from asana_typed.hedging import Deadline, as_deadline, hedged_call, latency_tracker
+from asana_typed.instrumentation import span
+
+# asana accepts at most ten actions per batch request
+MAX_BATCH_SIZE = 10
+
+
+class BatchResult(object):
+    """
+    Outcome of fetch_many, objects holds the decoded objects by gid and failed the http status of every
+    action that did not succeed.
+    """
+
+    def __init__(self, objects: Dict[str, Any] = None, failed: Dict[str, int] = None, pending: List[str] = None):
+        self.objects = objects if objects is not None else {}
+        self.failed = failed if failed is not None else {}
+        self.pending = pending if pending is not None else []
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} objects:{len(self.objects)} failed:{len(self.failed)} " \
+               f"pending:{len(self.pending)}"
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _run_batch(client, chunk: List[Tuple[str, str]], fields: Optional[List[str]], decode: bool) -> BatchResult:
+    actions = []
+    for resource_type, gid in chunk:
+        endpoint, model = resolve_resource_type(resource_type)
+        action = {'method': 'get', 'relative_path': '/{}/{}'.format(endpoint, gid)}
+        if fields:
+            action['options'] = {'fields': list(fields)}
+        actions.append(action)
+    with span('fetch.batch') as s:
+        s.count = len(actions)
+        start = time.perf_counter()
+        responses = client.post('/batch', {'actions': actions})
+        latency_tracker.record('batch', time.perf_counter() - start)
+    result = BatchResult()
+    for (resource_type, gid), response in zip(chunk, responses):
+        status = response.get('status_code')
+        if status != 200:
+            result.failed[gid] = status
+            continue
+        data = response['body']['data']
+        result.objects[gid] = resolve_resource_type(resource_type)[1].from_dict(data) if decode else data
+    return result
+
+
+def _run_single(client, resource_type: str, gid: str, decode: bool, hedge: bool) -> BatchResult:
+    result = BatchResult()
+    try:
+        if decode:
+            result.objects[gid] = fetch_resource(client, resource_type, gid, hedge=hedge)
+        else:
+            result.objects[gid] = getattr(client, resolve_resource_type(resource_type)[0]).find_by_id(gid)
+    except Exception as e:
+        status = getattr(e, 'status', None)
+        if status is None:
+            raise
+        result.failed[gid] = status
+    return result
+
+
+def _run_batch_bounded(client, chunk: List[Tuple[str, str]], fields: Optional[List[str]], decode: bool,
+                       hedge: bool) -> BatchResult:
+    delay = latency_tracker.hedge_delay('batch') if hedge else None
+    return hedged_call(_run_batch, (client, chunk, fields, decode), delay)
+
+
+def fetch_many(client, references: Iterable[Tuple[str, str]], max_workers: int = 8, use_batch_api: bool = True,
+               batch_size: int = MAX_BATCH_SIZE, fields: Optional[List[str]] = None, decode: bool = True,
+               deadline: Union[Deadline, float, None] = None, hedge: bool = False) -> BatchResult:
+    """
+    fetch many objects concurrently, grouped into batch api requests
+    :param client: asana client
+    :param references: (resource_type, gid) pairs, duplicates are fetched once
+    :param max_workers: concurrent requests
+    :param use_batch_api: group up to batch_size lookups into one /batch request, otherwise one find_by_id each
+    :param batch_size: actions per batch request, at most 10
+    :param fields: opt_fields for every lookup, only honoured by the batch api
+    :param decode: decode into the registered model, raw dicts are returned if unset
+    :param deadline: Deadline or budget in seconds, gids not fetched in time are listed in pending
+    :param hedge: duplicate requests slower than their endpoint's p95 latency, the first response wins
+    :return: BatchResult
+    """
+    unique = list(dict((gid, (resource_type, gid)) for resource_type, gid in references).values())
+    if not unique:
+        return BatchResult()
+    deadline = as_deadline(deadline)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        if use_batch_api:
+            batch_size = min(batch_size, MAX_BATCH_SIZE)
+            submitted = [(executor.submit(_run_batch_bounded, client, chunk, fields, decode, hedge),
+                          [gid for _, gid in chunk]) for chunk in _chunks(unique, batch_size)]
+        else:
+            submitted = [(executor.submit(_run_single, client, resource_type, gid, decode, hedge),
+                          [gid]) for resource_type, gid in unique]
+        wait([future for future, _ in submitted], timeout=deadline.remaining() if deadline is not None else None)
+        result = BatchResult()
+        for future, gids in submitted:
+            if not future.done():
+                future.cancel()
+                result.pending.extend(gids)
+                continue
+            partial = future.result()
+            result.objects.update(partial.objects)
+            result.failed.update(partial.failed)
+    finally:
+        # requests still running when the deadline passed are left to finish in the background
+        executor.shutdown(wait=deadline is None)
+    return result
@@ -0,0 +1,238 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from asana_typed.instrumentation import enabled, span
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(object):
+
+    def __init__(self, url: str, status: int, headers: dict, body: bytes, stored_at: float):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+
+    @property
+    def etag(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get('etag')
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get('last-modified')
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'status': self.status, 'headers': self.headers,
+                'body': base64.b64encode(self.body).decode('ascii'), 'stored_at': self.stored_at}
+
+    @staticmethod
+    def from_dict(obj: dict) -> 'CacheEntry':
+        return CacheEntry(obj['url'], obj['status'], obj['headers'], base64.b64decode(obj['body']),
+                          obj['stored_at'])
+
+
+class MemoryCache(object):
+    """
+    Bounded in-process cache, least recently used entries are dropped first
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class FileCache(object):
+    """
+    Cache persisted as one json file per entry in directory
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(key), 'r') as f:
+                return CacheEntry.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        # every writer gets its own temporary file, concurrent writes of a key never share one
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=key, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(entry.to_dict(), f)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class ConditionalCacheAdapter(HTTPAdapter):
+    """
+    Transport adapter caching GET responses that carry an ETag or Last-Modified header.
+    Cached entries are revalidated with If-None-Match / If-Modified-Since and a 304 is answered from the
+    local copy. Entries younger than stale_while_revalidate seconds are served directly while a background
+    request revalidates them.
+    """
+
+    def __init__(self, cache=None, stale_while_revalidate: float = 0, **kwargs):
+        """
+        :param cache: MemoryCache, FileCache or anything with get, set and delete, defaults to MemoryCache
+        :param stale_while_revalidate: seconds a stored entry is served without waiting on revalidation
+        """
+        super(ConditionalCacheAdapter, self).__init__(**kwargs)
+        self.cache = cache if cache is not None else MemoryCache()
+        self.stale_while_revalidate = stale_while_revalidate
+        self._revalidating = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(request) -> str:
+        # the authorization header is part of the key so different tokens never share entries
+        raw = '{} {}'.format(request.url, request.headers.get('Authorization', ''))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return super(ConditionalCacheAdapter, self).send(request, **kwargs)
+        with span('http.get') as s:
+            key = self.cache_key(request)
+            entry = self.cache.get(key)
+            if entry is not None and time.time() - entry.stored_at <= self.stale_while_revalidate:
+                self._revalidate_in_background(key, request, entry, kwargs)
+                response = self._build_response(request, entry)
+            else:
+                response = self._fetch(key, request, entry, **kwargs)
+            s.cache_hit = getattr(response, 'from_cache', False)
+            if enabled():
+                s.bytes = self._response_size(response, kwargs.get('stream', False))
+            return response
+
+    @staticmethod
+    def _response_size(response, stream: bool) -> int:
+        # a streamed body is left for the caller to read, its size is only known from Content-Length
+        length = response.headers.get('Content-Length')
+        if length is not None and length.isdigit():
+            return int(length)
+        if stream:
+            return 0
+        return len(response.content)
+
+    def _fetch(self, key: str, request, entry: Optional[CacheEntry], **kwargs):
+        if entry is not None:
+            request = request.copy()
+            if entry.etag:
+                request.headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request.headers['If-Modified-Since'] = entry.last_modified
+        response = super(ConditionalCacheAdapter, self).send(request, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            entry.stored_at = time.time()
+            self._store(key, entry)
+            return self._build_response(request, entry)
+        if response.status_code == 200 and ('etag' in response.headers or 'last-modified' in response.headers):
+            self._store(key, CacheEntry(request.url, response.status_code, dict(response.headers),
+                                        response.content, time.time()))
+        return response
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        # caching is best effort, a storage error never fails the request
+        try:
+            self.cache.set(key, entry)
+        except Exception:
+            logger.warning("Could not cache response of %s", entry.url, exc_info=True)
+
+    def _revalidate_in_background(self, key: str, request, entry: CacheEntry, kwargs: dict):
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def revalidate():
+            try:
+                self._fetch(key, request, entry, **kwargs)
+            except Exception:
+                # the stale copy stays in place, the next request revalidates again
+                pass
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=revalidate, name='asana-revalidate', daemon=True).start()
+
+    @staticmethod
+    def _build_response(request, entry: CacheEntry) -> Response:
+        response = Response()
+        response.status_code = entry.status
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.headers.pop('content-encoding', None)
+        response.headers.pop('content-length', None)
+        response._content = entry.body
+        response.url = entry.url
+        response.request = request
+        response.reason = 'OK'
+        response.encoding = 'utf-8'
+        response.from_cache = True
+        return response
+
+
+def conditional_cache(session, cache=None, stale_while_revalidate: float = 0):
+    """
+    mount a ConditionalCacheAdapter on a requests session, e.g. asana.Client(session=conditional_cache(session))
+    :param session: requests session used by the asana client
+    :param cache: MemoryCache, FileCache or compatible storage
+    :param stale_while_revalidate: seconds a stored entry is served without waiting on revalidation
+    :return: the session
+    """
+    adapter = ConditionalCacheAdapter(cache, stale_while_revalidate)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
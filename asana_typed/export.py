@@ -0,0 +1,277 @@
+import gzip
+import json
+import os
+import threading
+import zlib
+from queue import Queue
+from typing import Any, List, Optional
+
+from asana_typed.asana import Task, task_opt_fields, fetch_resource
+from asana_typed.pagination import paginate
+
+FORMATS = ('jsonl', 'snapshot')
+
+_STOP = object()
+
+
+class _Checkpoint(object):
+    __slots__ = ('unit',)
+
+    def __init__(self, unit: str):
+        # project gid or user:<gid>
+        self.unit = unit
+
+
+class _Failure(object):
+    __slots__ = ('error',)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class ExportStats(object):
+
+    def __init__(self):
+        self.projects = 0
+        self.tasks = 0
+        self.stories = 0
+        self.skipped_projects = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} projects:{self.projects} tasks:{self.tasks} stories:{self.stories} " \
+               f"skipped_projects:{self.skipped_projects}"
+
+
+class WorkspaceExporter(object):
+    """
+    Streams the projects, tasks and stories of a workspace to a file through a bounded pipeline:
+    the producer pages through project task listings, fetch workers load projects and stories concurrently
+    and a single writer serialises records. Every line is {"type": ..., "data": ...}, stories also carry
+    the gid of their task.
+
+    Projects are exported one after another with the subtasks of their tasks. Tasks in no project are then
+    found through the task lists of the workspace users, one user after another; unassigned tasks without a
+    project are not reachable this way and are not exported.
+    Once a project or user is completely written the file offset is stored in the checkpoint so a crashed
+    export resumes after the last finished one. Tasks already written are read back from the output on resume
+    and not exported again.
+    """
+
+    def __init__(self, client, workspace_gid: str, path: str, format: str = 'jsonl', include_stories: bool = True,
+                 workers: int = 8, queue_size: int = 256, checkpoint_path: Optional[str] = None,
+                 include_subtasks: bool = True, include_tasks_without_project: bool = True):
+        """
+        :param client: asana client
+        :param workspace_gid: workspace to export
+        :param path: output file
+        :param format: jsonl for json lines, snapshot for gzip compressed json lines
+        :param include_stories: also export the stories of every task
+        :param workers: concurrent fetch workers
+        :param queue_size: bound of the work and output queues, limits memory held by the pipeline
+        :param checkpoint_path: json file recording finished projects and users, enables resuming
+        :param include_subtasks: also export subtasks at any depth, costs a subtask listing per task
+        :param include_tasks_without_project: also export tasks assigned to a workspace user but in no project,
+            costs a task listing per user
+        """
+        if format not in FORMATS:
+            raise ValueError("format must be one of {}".format(', '.join(FORMATS)))
+        self.client = client
+        self.workspace_gid = workspace_gid
+        self.path = path
+        self.format = format
+        self.include_stories = include_stories
+        self.workers = workers
+        self.queue_size = queue_size
+        self.checkpoint_path = checkpoint_path
+        self.include_subtasks = include_subtasks
+        self.include_tasks_without_project = include_tasks_without_project
+        self.stats = ExportStats()
+        self._seen_tasks = set()
+        self._seen_lock = threading.Lock()
+
+    def _load_checkpoint(self) -> dict:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return {'workspace': self.workspace_gid, 'format': self.format, 'completed_projects': [], 'offset': 0}
+        with open(self.checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('workspace') != self.workspace_gid or checkpoint.get('format') != self.format:
+            raise ValueError("Checkpoint {} belongs to another export".format(self.checkpoint_path))
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict) -> None:
+        if self.checkpoint_path is None:
+            return
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def _exported_tasks(self) -> set:
+        """
+        gids of the tasks already in the output, so a resumed export does not write them again
+        """
+        gids = set()
+        with (gzip.open if self.format == 'snapshot' else open)(self.path, 'rb') as f:
+            for line in f:
+                if line.startswith(b'{"type":"task"'):
+                    gids.add(json.loads(line)['data']['gid'])
+        return gids
+
+    def run(self) -> ExportStats:
+        checkpoint = self._load_checkpoint()
+        completed = set(checkpoint['completed_projects'])
+        work = Queue(maxsize=self.queue_size)
+        output = Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        with open(self.path, 'ab' if checkpoint['offset'] else 'wb') as handle:
+            # drop whatever was written after the last finished project
+            handle.truncate(checkpoint['offset'])
+            handle.seek(checkpoint['offset'])
+            self._seen_tasks = self._exported_tasks() if checkpoint['offset'] else set()
+            writer_errors: List[BaseException] = []
+            writer = threading.Thread(target=self._write, name='asana-export-writer',
+                                      args=(handle, output, checkpoint, writer_errors, stop), daemon=True)
+            workers = [threading.Thread(target=self._work, name='asana-export-worker', args=(work, output),
+                                        daemon=True) for _ in range(self.workers)]
+            writer.start()
+            for worker in workers:
+                worker.start()
+            try:
+                self._produce(work, output, completed, stop)
+            finally:
+                for _ in workers:
+                    work.put(_STOP)
+                for worker in workers:
+                    worker.join()
+                output.put(_STOP)
+                writer.join()
+            if writer_errors:
+                raise writer_errors[0]
+        return self.stats
+
+    def _claim(self, gid: str) -> bool:
+        """whether the task still has to be exported, tasks reachable several ways are exported once"""
+        with self._seen_lock:
+            if gid in self._seen_tasks:
+                return False
+            self._seen_tasks.add(gid)
+            return True
+
+    def _produce(self, work: Queue, output: Queue, completed: set, stop: threading.Event) -> None:
+        projects = paginate(self.client, '/workspaces/{}/projects'.format(self.workspace_gid), prefetch=0)
+        for compact in projects:
+            if stop.is_set():
+                return
+            if compact['gid'] in completed:
+                self.stats.skipped_projects += 1
+                continue
+            work.put(('project', compact['gid']))
+            tasks = paginate(self.client, '/projects/{}/tasks'.format(compact['gid']), decoder=Task.from_dict,
+                             fields=task_opt_fields)
+            for task in tasks:
+                if stop.is_set():
+                    return
+                # tasks living in several projects are exported with the first one
+                if self._claim(task.gid):
+                    work.put(('task', task))
+            # every record of the project is in the output queue once the workers drained the work queue
+            work.join()
+            output.put(_Checkpoint(compact['gid']))
+        if self.include_tasks_without_project:
+            self._produce_user_tasks(work, output, completed, stop)
+
+    def _produce_user_tasks(self, work: Queue, output: Queue, completed: set, stop: threading.Event) -> None:
+        # users are checkpointed next to the projects as user:<gid>
+        users = paginate(self.client, '/workspaces/{}/users'.format(self.workspace_gid), prefetch=0)
+        for user in users:
+            unit = 'user:{}'.format(user['gid'])
+            if stop.is_set():
+                return
+            if unit in completed:
+                continue
+            # compact listing, only tasks not exported with a project are fetched completely
+            tasks = paginate(self.client, '/tasks', {'assignee': user['gid'], 'workspace': self.workspace_gid})
+            for task in tasks:
+                if stop.is_set():
+                    return
+                if self._claim(task['gid']):
+                    work.put(('task_gid', task['gid']))
+            work.join()
+            output.put(_Checkpoint(unit))
+
+    def _task_records(self, task: Task) -> List[dict]:
+        records = [{'type': 'task', 'data': task.to_dict()}]
+        if self.include_stories:
+            records.extend({'type': 'story', 'task': task.gid, 'data': story.to_dict()}
+                           for story in task.fetch_stories(self.client, prefetch=0))
+        return records
+
+    def _work(self, work: Queue, output: Queue) -> None:
+        while True:
+            item = work.get()
+            if item is _STOP:
+                work.task_done()
+                return
+            kind, value = item
+            try:
+                if kind == 'project':
+                    project = fetch_resource(self.client, 'project', value)
+                    output.put([{'type': 'project', 'data': project.to_dict()}])
+                    continue
+                pending = [fetch_resource(self.client, 'task', value) if kind == 'task_gid' else value]
+                # the subtree is expanded depth first by this worker, putting subtasks back on the bounded
+                # work queue could block every worker
+                while pending:
+                    task = pending.pop()
+                    output.put(self._task_records(task))
+                    if self.include_subtasks:
+                        pending.extend(subtask for subtask in reversed(task.fetch_subtasks(self.client))
+                                       if self._claim(subtask.gid))
+            except BaseException as e:
+                output.put(_Failure(e))
+            finally:
+                work.task_done()
+
+    def _write(self, handle, output: Queue, checkpoint: dict, errors: List[BaseException],
+               stop: threading.Event) -> None:
+        # snapshots are written as one gzip member per project, so truncating at a checkpoint stays valid
+        compressor = None
+        while True:
+            item = output.get()
+            if item is _STOP:
+                return
+            if errors:
+                continue
+            try:
+                if isinstance(item, _Failure):
+                    raise item.error
+                if isinstance(item, _Checkpoint):
+                    if compressor is not None:
+                        handle.write(compressor.flush())
+                        compressor = None
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                    checkpoint['completed_projects'].append(item.unit)
+                    checkpoint['offset'] = handle.tell()
+                    self._save_checkpoint(checkpoint)
+                    continue
+                data = b''.join(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+                                for record in item)
+                if self.format == 'snapshot':
+                    if compressor is None:
+                        compressor = zlib.compressobj(wbits=31)
+                    data = compressor.compress(data)
+                handle.write(data)
+                self._count(item)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+    def _count(self, records: List[Any]) -> None:
+        for record in records:
+            if record['type'] == 'project':
+                self.stats.projects += 1
+            elif record['type'] == 'task':
+                self.stats.tasks += 1
+            else:
+                self.stats.stories += 1
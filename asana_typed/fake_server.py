@@ -0,0 +1,426 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import dateutil.parser
+
+API_PREFIX = '/api/1.0'
+
+_collection_types = {'users': 'user', 'workspaces': 'workspace', 'projects': 'project', 'tasks': 'task',
+                     'tags': 'tag', 'stories': 'story'}
+
+
+def _compact(obj: dict) -> dict:
+    return {'gid': obj['gid'], 'name': obj['name'], 'resource_type': obj['resource_type']}
+
+
+def _isoformat(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class FakeWorkspace(object):
+    """
+    Generated workspace served by FakeAsanaServer, objects are kept as api payloads
+    """
+
+    def __init__(self, projects: int = 5, tasks_per_project: int = 100, stories_per_task: int = 5,
+                 users: int = 10, tags: int = 5, subtasks_per_task: int = 0, subtask_depth: int = 0,
+                 tasks_without_project: int = 0, seed: int = 0):
+        """
+        :param projects: number of projects
+        :param tasks_per_project: top level tasks per project
+        :param stories_per_task: stories per task, including subtasks
+        :param users: number of users, tasks are assigned round robin
+        :param tags: number of tags
+        :param subtasks_per_task: subtasks generated below every task down to subtask_depth
+        :param subtask_depth: levels of subtasks below the top level tasks
+        :param tasks_without_project: tasks belonging to no project, e.g. personal tasks of the users
+        :param seed: random seed for generated values
+        """
+        self._random = random.Random(seed)
+        self._next_gid = 1000
+        self._lock = threading.RLock()
+        self.objects: Dict[str, dict] = {}
+        self.project_tasks: Dict[str, List[str]] = {}
+        self.subtasks: Dict[str, List[str]] = {}
+        self.stories: Dict[str, List[str]] = {}
+        self.events: Dict[str, List[dict]] = {}
+        self.now = datetime(2019, 1, 1, tzinfo=timezone.utc)
+
+        self.workspace = self._add({'gid': self._gid(), 'email_domains': ['example.com'], 'is_organization': True,
+                                    'name': 'Fake Workspace', 'resource_type': 'workspace'})
+        self.users = [self._add({'gid': self._gid(), 'email': 'user{}@example.com'.format(i),
+                                 'name': 'User {}'.format(i), 'photo': None, 'resource_type': 'user',
+                                 'workspaces': [_compact(self.workspace)]}) for i in range(users)]
+        self.tags = [self._add({'gid': self._gid(), 'color': None, 'created_at': _isoformat(self.now),
+                                'followers': [], 'name': 'Tag {}'.format(i), 'notes': '', 'resource_type': 'tag',
+                                'workspace': _compact(self.workspace)}) for i in range(tags)]
+        self.projects = []
+        for i in range(projects):
+            project = self._add(self._project('Project {}'.format(i)))
+            self.projects.append(project)
+            self.project_tasks[project['gid']] = []
+            for j in range(tasks_per_project):
+                task = self._task('Task {}-{}'.format(i, j), project, None, stories_per_task)
+                self.project_tasks[project['gid']].append(task['gid'])
+                self._subtasks(task, project, subtasks_per_task, subtask_depth, stories_per_task)
+        for i in range(tasks_without_project):
+            self._task('Task {}'.format(i), None, None, stories_per_task)
+
+    def _gid(self) -> str:
+        self._next_gid += 1
+        return str(self._next_gid)
+
+    def _add(self, obj: dict) -> dict:
+        self.objects[obj['gid']] = obj
+        return obj
+
+    def _project(self, name: str) -> dict:
+        return {'gid': self._gid(), 'archived': False, 'color': None, 'created_at': _isoformat(self.now),
+                'current_status': None, 'due_date': None, 'followers': [], 'layout': 'list', 'members': [],
+                'modified_at': _isoformat(self.now), 'name': name, 'notes': '', 'owner': None, 'public': True,
+                'resource_type': 'project', 'start_on': None, 'team': None, 'workspace': _compact(self.workspace)}
+
+    def _task(self, name: str, project: Optional[dict], parent: Optional[dict], stories: int) -> dict:
+        gid = self._gid()
+        assignee = self.users[int(gid) % len(self.users)] if self.users else None
+        tags = [_compact(self.tags[int(gid) % len(self.tags)])] if self.tags else []
+        created_at = self.now - timedelta(days=self._random.randint(1, 365))
+        due_on = (created_at + timedelta(days=self._random.randint(1, 60))).strftime('%Y-%m-%d')
+        completed = self._random.random() < 0.5
+        task = self._add({
+            'gid': gid, 'assignee': _compact(assignee) if assignee else None, 'assignee_status': 'upcoming',
+            'completed': completed, 'completed_at': _isoformat(self.now) if completed else None,
+            'created_at': _isoformat(created_at), 'due_at': None, 'due_on': due_on, 'followers': [],
+            'hearted': False, 'hearts': [], 'liked': False, 'likes': [],
+            'memberships': [{'project': _compact(project), 'section': None}] if project else [],
+            'modified_at': _isoformat(created_at + timedelta(hours=self._random.randint(0, 48))), 'name': name,
+            'notes': 'Notes of {}'.format(name), 'num_hearts': 0, 'num_likes': 0,
+            'parent': _compact(parent) if parent else None,
+            'projects': [_compact(project)] if project and parent is None else [], 'resource_type': 'task',
+            'start_on': None, 'tags': tags, 'resource_subtype': 'default_task', 'workspace': _compact(self.workspace)})
+        self.subtasks[gid] = []
+        self.stories[gid] = []
+        for k in range(stories):
+            author = self.users[k % len(self.users)] if self.users else task
+            story = self._add({'gid': self._gid(), 'created_at': _isoformat(created_at + timedelta(hours=k)),
+                               'created_by': _compact(author), 'resource_subtype': 'comment_added',
+                               'resource_type': 'story', 'text': 'Comment {} on {}'.format(k, name),
+                               'type': 'comment'})
+            self.stories[gid].append(story['gid'])
+        return task
+
+    def _subtasks(self, task: dict, project: dict, count: int, depth: int, stories: int) -> None:
+        if depth <= 0:
+            return
+        for i in range(count):
+            subtask = self._task('{} / {}'.format(task['name'], i), project, task, stories)
+            self.subtasks[task['gid']].append(subtask['gid'])
+            self._subtasks(subtask, project, count, depth - 1, stories)
+
+    def touch(self, gid: str, **changes) -> dict:
+        """
+        modify an object, bump its modified_at and emit a changed event to its projects and the workspace
+        """
+        with self._lock:
+            obj = self.objects[gid]
+            obj.update(changes)
+            self.now += timedelta(seconds=1)
+            if 'modified_at' in obj:
+                obj['modified_at'] = _isoformat(self.now)
+            resources = [self.workspace['gid']] + [p['gid'] for p in obj.get('projects') or []]
+            for resource_gid in resources:
+                self.events.setdefault(resource_gid, []).append(
+                    {'action': 'changed', 'created_at': _isoformat(self.now),
+                     'resource': {'gid': gid, 'resource_type': obj['resource_type']}})
+            return obj
+
+    def tasks(self) -> List[dict]:
+        return [obj for obj in self.objects.values() if obj['resource_type'] == 'task']
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeAsanaServer(object):
+    """
+    Local stand-in for the Asana api serving a FakeWorkspace, for load and concurrency benchmarks.
+    Supports offset pagination, opt_fields, ETags, /batch, /events and workspace task search, with
+    configurable latency and injected 429 responses.
+    """
+
+    def __init__(self, workspace: FakeWorkspace = None, latency: float = 0.0, jitter: float = 0.0,
+                 slow_fraction: float = 0.0, slow_latency: float = 0.0, rate_limit_fraction: float = 0.0,
+                 retry_after: float = 1.0, host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        """
+        :param workspace: data to serve, defaults to FakeWorkspace()
+        :param latency: seconds added to every response
+        :param jitter: uniform random seconds added on top of latency
+        :param slow_fraction: fraction of requests delayed by slow_latency instead, to model tail latency
+        :param slow_latency: seconds for slow requests
+        :param rate_limit_fraction: fraction of requests answered with 429
+        :param retry_after: Retry-After header of injected 429 responses
+        """
+        self.workspace = workspace if workspace is not None else FakeWorkspace()
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.rate_limit_fraction = rate_limit_fraction
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}{}'.format(host, port, API_PREFIX)
+
+    def start(self) -> 'FakeAsanaServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-asana', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeAsanaServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _delay(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.requests += 1
+            rate_limited = self._random.random() < self.rate_limit_fraction
+            if rate_limited:
+                self.rate_limited += 1
+            if self._random.random() < self.slow_fraction:
+                delay = self.slow_latency
+            else:
+                delay = self.latency + self._random.uniform(0, self.jitter)
+        return delay, rate_limited
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Any, headers: Dict[str, str] = None):
+                body = json.dumps(payload).encode('utf-8')
+                headers = dict(headers or {})
+                if status == 200 and self.command == 'GET':
+                    etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+                    headers['ETag'] = etag
+                    if self.headers.get('If-None-Match') == etag:
+                        status, body = 304, b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                delay, rate_limited = server._delay()
+                if delay:
+                    time.sleep(delay)
+                if self.command == 'POST':
+                    length = int(self.headers.get('Content-Length') or 0)
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                else:
+                    body = None
+                if rate_limited:
+                    self._send(429, {'errors': [{'message': 'Rate limit enforced'}]},
+                               {'Retry-After': str(server.retry_after)})
+                    return
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+                status, payload = server.route(self.command, path, query, body)
+                self._send(status, payload)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return Handler
+
+    # routing
+
+    _routes = [
+        ('GET', re.compile(r'^/users/me$'), '_me'),
+        ('GET', re.compile(r'^/workspaces$'), '_workspaces'),
+        ('GET', re.compile(r'^/workspaces/(\w+)/tasks/search$'), '_search'),
+        ('GET', re.compile(r'^/workspaces/(\w+)/projects$'), '_projects'),
+        ('GET', re.compile(r'^/workspaces/(\w+)/users$'), '_users'),
+        ('GET', re.compile(r'^/projects/(\w+)/tasks$'), '_project_tasks'),
+        ('GET', re.compile(r'^/tasks/(\w+)/stories$'), '_task_stories'),
+        ('GET', re.compile(r'^/tasks/(\w+)/subtasks$'), '_task_subtasks'),
+        ('GET', re.compile(r'^/tasks$'), '_tasks'),
+        ('GET', re.compile(r'^/events$'), '_events'),
+        ('GET', re.compile(r'^/(users|workspaces|projects|tasks|tags|stories)/(\w+)$'), '_object'),
+        ('POST', re.compile(r'^/batch$'), '_batch'),
+    ]
+
+    def route(self, method: str, path: str, query: Dict[str, str], body: Optional[dict]) -> Tuple[int, dict]:
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                with self.workspace._lock:
+                    return getattr(self, handler)(query, body, *match.groups())
+        return 404, {'errors': [{'message': 'Unknown path {}'.format(path)}]}
+
+    @staticmethod
+    def _fields(obj: dict, query: Dict[str, str]) -> dict:
+        fields = query.get('opt_fields')
+        if not fields:
+            return obj
+        wanted = {field.split('.')[0] for field in fields.split(',')}
+        wanted.add('gid')
+        return {key: value for key, value in obj.items() if key in wanted}
+
+    def _collection(self, gids: List[str], query: Dict[str, str], path: str, compact: bool = True) -> Tuple[int, dict]:
+        limit = min(int(query.get('limit', 100)), 100)
+        offset = int(query.get('offset', 0))
+        page = gids[offset:offset + limit]
+        objects = [self.workspace.objects[gid] for gid in page]
+        if compact and not query.get('opt_fields'):
+            data = [_compact(obj) for obj in objects]
+        else:
+            data = [self._fields(obj, query) for obj in objects]
+        next_page = None
+        if offset + limit < len(gids):
+            next_offset = str(offset + limit)
+            next_page = {'offset': next_offset, 'path': '{}?limit={}&offset={}'.format(path, limit, next_offset),
+                         'uri': '{}{}?limit={}&offset={}'.format(self.url, path, limit, next_offset)}
+        return 200, {'data': data, 'next_page': next_page}
+
+    def _me(self, query, body):
+        return 200, {'data': self._fields(self.workspace.users[0], query)}
+
+    def _workspaces(self, query, body):
+        return 200, {'data': [_compact(self.workspace.workspace)]}
+
+    def _projects(self, query, body, workspace_gid):
+        return self._collection([p['gid'] for p in self.workspace.projects], query,
+                                '/workspaces/{}/projects'.format(workspace_gid))
+
+    def _users(self, query, body, workspace_gid):
+        return self._collection([u['gid'] for u in self.workspace.users], query,
+                                '/workspaces/{}/users'.format(workspace_gid))
+
+    def _project_tasks(self, query, body, project_gid):
+        if project_gid not in self.workspace.project_tasks:
+            return 404, {'errors': [{'message': 'project not found'}]}
+        return self._collection(self.workspace.project_tasks[project_gid], query,
+                                '/projects/{}/tasks'.format(project_gid))
+
+    def _tasks(self, query, body):
+        project_gid = query.get('project')
+        if project_gid is not None:
+            return self._project_tasks(query, body, project_gid)
+        assignee = query.get('assignee')
+        gids = [task['gid'] for task in self.workspace.tasks()
+                if assignee is None or (task['assignee'] or {}).get('gid') == assignee]
+        return self._collection(gids, query, '/tasks')
+
+    def _task_stories(self, query, body, task_gid):
+        if task_gid not in self.workspace.stories:
+            return 404, {'errors': [{'message': 'task not found'}]}
+        return self._collection(self.workspace.stories[task_gid], query, '/tasks/{}/stories'.format(task_gid),
+                                compact=False)
+
+    def _task_subtasks(self, query, body, task_gid):
+        if task_gid not in self.workspace.subtasks:
+            return 404, {'errors': [{'message': 'task not found'}]}
+        return self._collection(self.workspace.subtasks[task_gid], query, '/tasks/{}/subtasks'.format(task_gid))
+
+    def _object(self, query, body, collection, gid):
+        obj = self.workspace.objects.get(gid)
+        if obj is None or obj['resource_type'] != _collection_types[collection]:
+            return 404, {'errors': [{'message': '{} not found'.format(gid)}]}
+        return 200, {'data': self._fields(obj, query)}
+
+    def _search(self, query, body, workspace_gid):
+        tasks = self.workspace.tasks()
+        if 'completed' in query:
+            completed = query['completed'] == 'true'
+            tasks = [t for t in tasks if t['completed'] is completed]
+        if 'assignee.any' in query:
+            assignees = set(query['assignee.any'].split(','))
+            tasks = [t for t in tasks if (t['assignee'] or {}).get('gid') in assignees]
+        if 'projects.any' in query:
+            projects = set(query['projects.any'].split(','))
+            tasks = [t for t in tasks if projects.intersection(p['gid'] for p in t['projects'])]
+        if 'due_on' in query:
+            tasks = [t for t in tasks if t['due_on'] == query['due_on']]
+        if 'due_on.before' in query:
+            tasks = [t for t in tasks if t['due_on'] and t['due_on'] < query['due_on.before']]
+        if 'due_on.after' in query:
+            tasks = [t for t in tasks if t['due_on'] and t['due_on'] > query['due_on.after']]
+        if 'modified_at.before' in query:
+            before = dateutil.parser.isoparse(query['modified_at.before'])
+            tasks = [t for t in tasks if dateutil.parser.isoparse(t['modified_at']) < before]
+        if 'modified_at.after' in query:
+            after = dateutil.parser.isoparse(query['modified_at.after'])
+            tasks = [t for t in tasks if dateutil.parser.isoparse(t['modified_at']) > after]
+        if 'created_at.before' in query:
+            before = dateutil.parser.isoparse(query['created_at.before'])
+            tasks = [t for t in tasks if dateutil.parser.isoparse(t['created_at']) < before]
+        if query.get('sort_by') == 'created_at':
+            tasks = sorted(tasks, key=lambda t: (t['created_at'], t['gid']),
+                           reverse=query.get('sort_ascending') != 'true')
+        limit = min(int(query.get('limit', 100)), 100)
+        return 200, {'data': [self._fields(t, query) if query.get('opt_fields') else _compact(t)
+                              for t in tasks[:limit]]}
+
+    def _events(self, query, body):
+        resource = query.get('resource')
+        log = self.workspace.events.get(resource, [])
+        fresh = str(len(log))
+        sync = query.get('sync')
+        if sync is None or not sync.isdigit() or int(sync) > len(log):
+            return 412, {'errors': [{'message': 'Sync token invalid or too old'}], 'sync': fresh}
+        position = int(sync)
+        page = log[position:position + 100]
+        return 200, {'data': page, 'sync': str(position + len(page)), 'has_more': position + len(page) < len(log)}
+
+    def _batch(self, query, body):
+        actions = (body or {}).get('data', {}).get('actions', [])
+        if len(actions) > 10:
+            return 400, {'errors': [{'message': 'at most 10 actions are allowed'}]}
+        responses = []
+        for action in actions:
+            relative = urlparse(action.get('relative_path', ''))
+            action_query = {key: values[-1] for key, values in parse_qs(relative.query).items()}
+            options = action.get('options') or {}
+            if options.get('fields'):
+                action_query['opt_fields'] = ','.join(options['fields'])
+            for key in ('limit', 'offset'):
+                if key in options:
+                    action_query[key] = str(options[key])
+            action_query.update({key: str(value) for key, value in (action.get('data') or {}).items()})
+            status, payload = self.route(action.get('method', 'get').upper(), relative.path, action_query, None)
+            responses.append({'status_code': status, 'headers': {}, 'body': payload})
+        return 200, {'data': responses}
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline(object):
+    """
+    Latency budget shared by every call made on behalf of one operation
+    """
+
+    def __init__(self, budget: float):
+        """
+        :param budget: seconds from now until the deadline
+        """
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} remaining:{self.remaining():.3f}s"
+
+
+def as_deadline(deadline: Union[Deadline, float, None]) -> Optional[Deadline]:
+    """accept a Deadline or a budget in seconds"""
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
+
+
+class LatencyTracker(object):
+    """
+    Rolling window of call durations per operation, used to derive hedge delays
+    """
+
+    def __init__(self, window: int = 1000, min_samples: int = 20, default_delay: float = 0.5,
+                 quantile: float = 0.95):
+        """
+        :param window: durations kept per operation
+        :param min_samples: samples needed before the quantile replaces default_delay
+        :param default_delay: hedge delay used until enough samples were recorded
+        :param quantile: quantile of recorded durations used as hedge delay
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.quantile = quantile
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, duration: float) -> None:
+        samples = self._samples.get(operation)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(operation, deque(maxlen=self.window))
+        samples.append(duration)
+
+    def hedge_delay(self, operation: str) -> float:
+        samples = self._samples.get(operation)
+        if samples is None or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+
+latency_tracker = LatencyTracker()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='asana-hedge')
+    return _executor
+
+
+def hedged_call(function: Callable[..., Any], args: Tuple = (), delay: Optional[float] = None,
+                deadline: Optional[Deadline] = None) -> Any:
+    """
+    run an idempotent call, optionally sending a duplicate after delay seconds, the first success wins.
+    Losing calls are not interrupted, their result is discarded.
+    :param function: idempotent callable
+    :param args: arguments of function
+    :param delay: seconds to wait before hedging, None disables the duplicate
+    :param deadline: raise DeadlineExceeded once it passes
+    :return: result of the first successful call
+    """
+    executor = _get_executor()
+    pending = {executor.submit(function, *args)}
+    hedged = delay is None
+    error = None
+    while pending:
+        timeout = deadline.remaining() if deadline is not None else None
+        if not hedged:
+            timeout = delay if timeout is None else min(delay, timeout)
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded("Deadline passed before any response arrived")
+        if not hedged and not done:
+            # the primary is slower than the hedge delay, fire the duplicate
+            hedged = True
+            pending.add(executor.submit(function, *args))
+    raise error
@@ -0,0 +1,161 @@
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_UNREADABLE = object()
+
+
+def _indexed_values(path: str, items: Sequence) -> Iterator[Tuple[int, Any]]:
+    getter = attrgetter(path)
+    for position, item in enumerate(items):
+        try:
+            yield position, getter(item)
+        except AttributeError:
+            # e.g. assignee.gid of an unassigned task
+            yield position, _UNREADABLE
+
+
+class _Index(object):
+    """
+    Positions of items the index can not place, e.g. where the path can not be read, are kept as residual
+    candidates of every lookup, so the filters applied to the candidates behave as on a scan of the view.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._items: Optional[Sequence] = None
+        self._size = 0
+        self._residual: List[int] = []
+
+    def current(self, items: Sequence) -> bool:
+        """
+        whether the index was built from items at their current length, replaced items are not detected
+        """
+        return self._items is items and self._size == len(items)
+
+    def _built(self, items: Sequence, residual: List[int]) -> None:
+        self._items = items
+        self._size = len(items)
+        self._residual = residual
+
+    def _with_residual(self, positions: List[int]) -> List[int]:
+        return list(merge(positions, self._residual)) if self._residual else positions
+
+
+class HashIndex(_Index):
+    """
+    Maps the values of an attribute to the positions of the items holding them, for equality lookups
+    """
+    kind = 'hash'
+    operators = ('eq',)
+
+    def __init__(self, path: str):
+        """
+        :param path: dotted attribute path, e.g. assignee.gid
+        """
+        super(HashIndex, self).__init__(path)
+        self._positions: Dict[Any, List[int]] = {}
+
+    def build(self, items: Sequence) -> None:
+        positions = {}
+        residual = []
+        for position, value in _indexed_values(self.path, items):
+            if value is _UNREADABLE:
+                residual.append(position)
+                continue
+            try:
+                positions.setdefault(value, []).append(position)
+            except TypeError:
+                raise TypeError("Can not hash index {}, {!r} is unhashable".format(self.path, value))
+        self._positions = positions
+        self._built(items, residual)
+
+    def count(self, op: str, value: Any) -> Optional[int]:
+        """
+        :return: number of candidate items, None if the index can not answer the lookup
+        """
+        try:
+            return len(self._positions.get(value, ())) + len(self._residual)
+        except TypeError:
+            return None
+
+    def lookup(self, op: str, value: Any) -> List[int]:
+        """
+        :return: ascending positions of candidate items
+        """
+        return self._with_residual(self._positions.get(value, []))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} {self.path} values:{len(self._positions)}"
+
+
+class SortedIndex(_Index):
+    """
+    Attribute values in sorted order with the positions of their items, for range and equality lookups.
+    Items without a comparable value (None, or naive datetime.min among aware datetimes) are residual candidates.
+    """
+    kind = 'sorted'
+    operators = ('eq', 'lt', 'le', 'gt', 'ge')
+
+    def __init__(self, path: str):
+        """
+        :param path: dotted attribute path, e.g. due_on
+        """
+        super(SortedIndex, self).__init__(path)
+        self._values: List[Any] = []
+        self._positions: List[int] = []
+
+    def build(self, items: Sequence) -> None:
+        pairs = []
+        residual = []
+        for position, value in _indexed_values(self.path, items):
+            if value is None or value is _UNREADABLE:
+                residual.append(position)
+            else:
+                pairs.append((position, value))
+        try:
+            pairs.sort(key=itemgetter(1))
+        except TypeError:
+            # from_datetime decodes absent aware datetimes as the naive datetime.min
+            residual.extend(position for position, value in pairs if getattr(value, 'tzinfo', True) is None)
+            residual.sort()
+            pairs = [pair for pair in pairs if getattr(pair[1], 'tzinfo', True) is not None]
+            pairs.sort(key=itemgetter(1))
+        self._positions = [position for position, _ in pairs]
+        self._values = [value for _, value in pairs]
+        self._built(items, residual)
+
+    def _range(self, op: str, value: Any) -> Tuple[int, int]:
+        if op == 'eq':
+            return bisect_left(self._values, value), bisect_right(self._values, value)
+        if op == 'lt':
+            return 0, bisect_left(self._values, value)
+        if op == 'le':
+            return 0, bisect_right(self._values, value)
+        if op == 'gt':
+            return bisect_right(self._values, value), len(self._values)
+        return bisect_left(self._values, value), len(self._values)
+
+    def count(self, op: str, value: Any) -> Optional[int]:
+        """
+        :return: number of candidate items, None if the index can not answer the lookup
+        """
+        try:
+            start, stop = self._range(op, value)
+        except TypeError:
+            return None
+        return stop - start + len(self._residual)
+
+    def lookup(self, op: str, value: Any) -> List[int]:
+        """
+        :return: ascending positions of candidate items
+        """
+        start, stop = self._range(op, value)
+        return self._with_residual(sorted(self._positions[start:stop]))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} {self.path} values:{len(self._values)}"
+
+
+index_kinds = {HashIndex.kind: HashIndex, SortedIndex.kind: SortedIndex}
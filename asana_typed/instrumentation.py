@@ -0,0 +1,180 @@
+import random
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+_subscribers: List[Callable[['Event'], None]] = []
+
+
+class Event(object):
+    """
+    Measurement of one instrumented operation, handed to every subscriber
+    """
+    __slots__ = ('operation', 'duration', 'count', 'bytes', 'cache_hit', 'error')
+
+    def __init__(self, operation: str, duration: float, count: int = 0, bytes: int = 0,
+                 cache_hit: Optional[bool] = None, error: Optional[BaseException] = None):
+        self.operation = operation
+        self.duration = duration
+        self.count = count
+        self.bytes = bytes
+        self.cache_hit = cache_hit
+        self.error = error
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} {self.operation}:{self.duration * 1000:.3f}ms"
+
+
+def subscribe(callback: Callable[[Event], None]) -> Callable[[Event], None]:
+    """
+    register a callback receiving an Event for every instrumented operation
+    :return: the callback so it can be used as a decorator
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback: Callable[[Event], None]) -> None:
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def enabled() -> bool:
+    return bool(_subscribers)
+
+
+class _NullSpan(object):
+    # shared by every span while nobody listens, the attributes callers set are simply dropped
+    __slots__ = ('count', 'bytes', 'cache_hit')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ('operation', 'count', 'bytes', 'cache_hit', '_start')
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.count = 0
+        self.bytes = 0
+        self.cache_hit = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        event = Event(self.operation, time.perf_counter() - self._start, self.count, self.bytes, self.cache_hit,
+                      exc_val)
+        for callback in list(_subscribers):
+            callback(event)
+        return False
+
+
+def span(operation: str):
+    """
+    context manager timing the enclosed block, set count, bytes or cache_hit on the returned span.
+    Without subscribers a shared no-op span is returned.
+    """
+    if not _subscribers:
+        return _NULL_SPAN
+    return _Span(operation)
+
+
+def instrumented(operation: str):
+    """
+    decorator timing every call of the wrapped function as operation
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _subscribers:
+                return function(*args, **kwargs)
+            with _Span(operation) as s:
+                s.count = 1
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class StatsAggregator(object):
+    """
+    In-process subscriber reporting p50/p95/p99 durations and totals per operation.
+    Durations are kept in a reservoir of max_samples per operation.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            stats = self._stats.get(event.operation)
+            if stats is None:
+                stats = self._stats[event.operation] = {'calls': 0, 'errors': 0, 'objects': 0, 'bytes': 0,
+                                                        'cache_hits': 0, 'total': 0.0, 'samples': []}
+            stats['calls'] += 1
+            stats['objects'] += event.count
+            stats['bytes'] += event.bytes
+            stats['total'] += event.duration
+            if event.cache_hit:
+                stats['cache_hits'] += 1
+            if event.error is not None:
+                stats['errors'] += 1
+            samples = stats['samples']
+            if len(samples) < self.max_samples:
+                samples.append(event.duration)
+            else:
+                slot = random.randrange(stats['calls'])
+                if slot < self.max_samples:
+                    samples[slot] = event.duration
+
+    def attach(self) -> 'StatsAggregator':
+        subscribe(self)
+        return self
+
+    def detach(self) -> None:
+        unsubscribe(self)
+
+    def __enter__(self) -> 'StatsAggregator':
+        return self.attach()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detach()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+
+    def report(self) -> Dict[str, dict]:
+        """
+        :return: operation to calls, errors, objects, bytes, cache_hits, total, p50, p95 and p99 in seconds
+        """
+        report = {}
+        with self._lock:
+            for operation, stats in self._stats.items():
+                ordered = sorted(stats['samples'])
+                entry = {key: value for key, value in stats.items() if key != 'samples'}
+                entry['p50'] = _percentile(ordered, 0.50)
+                entry['p95'] = _percentile(ordered, 0.95)
+                entry['p99'] = _percentile(ordered, 0.99)
+                report[operation] = entry
+        return report
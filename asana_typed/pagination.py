@@ -0,0 +1,139 @@
+import threading
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+from asana_typed.instrumentation import span
+
+T = TypeVar("T")
+
+PageFetcher = Callable[[Optional[str], int], Tuple[List[Any], Optional[str]]]
+
+_DONE = object()
+
+
+def client_page_fetcher(client, path: str, query: Optional[dict] = None, **options) -> PageFetcher:
+    """
+    build a page fetcher for a collection endpoint of a python-asana client
+    :param client: asana client
+    :param path: collection path, e.g. /tasks/{gid}/stories
+    :param query: extra query parameters sent with every page
+    :param options: extra client options (fields, expand, ...)
+    :return: callable taking (offset, page_size) and returning (items, next offset)
+    """
+    query = dict(query or {})
+
+    def fetch_page(offset: Optional[str], page_size: int):
+        params = dict(query)
+        params['limit'] = page_size
+        if offset is not None:
+            params['offset'] = offset
+        result = client.get(path, params, full_payload=True, **options)
+        next_page = result.get('next_page')
+        return result.get('data') or [], next_page['offset'] if next_page else None
+
+    return fetch_page
+
+
+class PrefetchPageIterator(object):
+    """
+    Iterates a paginated collection while the next pages are fetched in a background thread,
+    so decoding page N overlaps with the request for page N+1.
+    """
+
+    def __init__(self, fetch_page: PageFetcher, decoder: Callable[[Any], T] = None, page_size: int = 100,
+                 prefetch: int = 1):
+        """
+        :param fetch_page: callable taking (offset, page_size) and returning (items, next offset)
+        :param decoder: applied to every item of a page, items are returned untouched if not set
+        :param page_size: number of items requested per page
+        :param prefetch: number of raw pages allowed to be fetched ahead of the consumer, 0 fetches inline
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        if prefetch < 0:
+            raise ValueError("prefetch can not be negative")
+        self.fetch_page = fetch_page
+        self.decoder = decoder
+        self.page_size = page_size
+        self.prefetch = prefetch
+
+    def __iter__(self) -> Iterator[T]:
+        for page in self.pages():
+            yield from page
+
+    def pages(self) -> Iterator[List[T]]:
+        raw_pages = self._raw_pages() if self.prefetch == 0 else self._prefetched_pages()
+        decoder = self.decoder
+        for page in raw_pages:
+            if decoder is None:
+                yield page
+            else:
+                yield [decoder(item) for item in page]
+
+    def _raw_pages(self) -> Iterator[List[Any]]:
+        offset = None
+        while True:
+            with span('fetch.page') as s:
+                items, offset = self.fetch_page(offset, self.page_size)
+                s.count = len(items)
+            if items:
+                yield items
+            if offset is None:
+                return
+
+    def _prefetched_pages(self) -> Iterator[List[Any]]:
+        pages = Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    pages.put(value, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for page in self._raw_pages():
+                    if not put(page):
+                        return
+            except BaseException as e:
+                put(e)
+                return
+            put(_DONE)
+
+        worker = threading.Thread(target=produce, name='asana-prefetch', daemon=True)
+        worker.start()
+        try:
+            while True:
+                try:
+                    page = pages.get(timeout=0.1)
+                except Empty:
+                    if not worker.is_alive() and pages.empty():
+                        return
+                    continue
+                if page is _DONE:
+                    return
+                if isinstance(page, BaseException):
+                    raise page
+                yield page
+        finally:
+            stop.set()
+
+
+def paginate(client, path: str, query: Optional[dict] = None, decoder: Callable[[Any], T] = None,
+             page_size: int = 100, prefetch: int = 1, **options) -> Iterator[T]:
+    """
+    lazily iterate a collection endpoint, prefetching pages in the background
+    :param client: asana client
+    :param path: collection path
+    :param query: extra query parameters
+    :param decoder: applied to every item, e.g. Story.from_dict
+    :param page_size: items per page, asana allows at most 100
+    :param prefetch: look-ahead depth in pages
+    :return: iterator of decoded items
+    """
+    fetch_page = client_page_fetcher(client, path, query, **options)
+    return iter(PrefetchPageIterator(fetch_page, decoder, page_size, prefetch))
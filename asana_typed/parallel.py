@@ -0,0 +1,104 @@
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from operator import attrgetter
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from asana_typed.query import Predicate, compile_filters, sort_items
+
+# views smaller than this are filtered in the calling thread. Every parallel get_list starts a new pool:
+# about 6ms for two forked workers, 30ms with forkserver and 120ms with spawn, which also pickle the chunks.
+# On a single cpu two workers ran at 0.84x (filter) and 0.68x (filter and sort) of the sequential query,
+# only views whose filters are expensive enough to amortise the startup on several cpus gain.
+parallel_threshold = 10000
+
+# ProcessPoolExecutor takes mp_context, initializer and initargs from Python 3.7, older versions use threads
+_process_pools = sys.version_info >= (3, 7)
+
+# view of the pool a worker process belongs to, set by the pool initializer. Forked workers inherit the
+# initializer arguments, so only chunk bounds and matching positions cross process boundaries.
+_shared_view: Optional[Sequence] = None
+
+
+def _share_view(view: Sequence) -> None:
+    global _shared_view
+    _shared_view = view
+
+
+def _start_method() -> str:
+    # forking a process that runs other threads (prefetching, hedging, revalidation) can copy locks they
+    # hold, fork is only used while the calling thread is the only one
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return 'fork'
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _free_threaded() -> bool:
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _position_sorters(view: Sequence, sort_specs: List[Tuple[str, bool]]) -> List[tuple]:
+    return [(lambda i, getter=attrgetter(path): getter(view[i]), ascending) for path, ascending in sort_specs]
+
+
+def _match_positions(view: Sequence, predicate: Callable[[Any], bool], start: int, stop: int,
+                     sorters: Optional[List[tuple]]) -> List[int]:
+    positions = [i for i in range(start, stop) if predicate(view[i])]
+    if sorters:
+        sort_items(positions, sorters)
+    return positions
+
+
+def _match_chunk(specs: List[tuple], sort_specs: Optional[List[Tuple[str, bool]]], start: int, stop: int,
+                 items: Optional[Sequence] = None) -> List[int]:
+    # runs in a worker process, filters are rebuilt from their specs
+    view = _shared_view if items is None else items
+    if items is not None:
+        start, stop = 0, len(items)
+    predicate = compile_filters([Predicate(op, path, value, **options) for op, path, value, options in specs])
+    sorters = _position_sorters(view, sort_specs) if sort_specs else None
+    return _match_positions(view, predicate, start, stop, sorters)
+
+
+def parallel_matches(view: Sequence, filters: List[Callable[[Any], bool]], sort_specs: Optional[List[tuple]],
+                     workers: int, chunk_size: Optional[int] = None) -> List:
+    """
+    filter view in chunks on a pool of workers. Chunks run in processes when every filter is a Predicate on an
+    attribute path, otherwise, on free threaded Python or before Python 3.7 they run on threads. A new pool is
+    started on every call, see parallel_threshold. Processes are forked while the calling thread is the only
+    one, otherwise they are started with forkserver or spawn, which import the main module and need it guarded
+    by if __name__ == '__main__'.
+    :param view: items to filter
+    :param filters: Predicates or callables
+    :param sort_specs: (attribute path, ascending) pairs, every chunk is sorted by them so the result is a
+        concatenation of sorted runs that sort_items merges in linear time
+    :param workers: pool size
+    :param chunk_size: items per chunk, defaults to spreading the view evenly over the workers
+    :return: matching items in view order, or in chunk order with every chunk sorted
+    """
+    chunk_size = chunk_size or -(-len(view) // workers)
+    bounds = [(start, min(start + chunk_size, len(view))) for start in range(0, len(view), chunk_size)]
+    specs = [f.spec() if isinstance(f, Predicate) else None for f in filters]
+    if None in specs or _free_threaded() or not _process_pools:
+        predicate = compile_filters(filters)
+        sorters = _position_sorters(view, sort_specs) if sort_specs else None
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asana-query') as executor:
+            chunks = list(executor.map(lambda b: _match_positions(view, predicate, b[0], b[1], sorters), bounds))
+        return [view[i] for chunk in chunks for i in chunk]
+    method = _start_method()
+    context = multiprocessing.get_context(method)
+    if method == 'fork':
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_share_view,
+                                 initargs=(view,)) as executor:
+            futures = [executor.submit(_match_chunk, specs, sort_specs, start, stop) for start, stop in bounds]
+            chunks = [future.result() for future in futures]
+        return [view[i] for chunk in chunks for i in chunk]
+    # spawned workers receive their chunk pickled and answer positions relative to it
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(_match_chunk, specs, sort_specs, start, stop, view[start:stop])
+                   for start, stop in bounds]
+        chunks = [[start + i for i in future.result()] for (start, _), future in zip(bounds, futures)]
+    return [view[i] for chunk in chunks for i in chunk]
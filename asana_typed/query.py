@@ -1,8 +1,21 @@
+import heapq
+import keyword
+import os
+import random
 import re
-from operator import attrgetter
-from typing import List
+import time
+import weakref
+from datetime import datetime
+from itertools import compress, islice, repeat
+from operator import and_, attrgetter, ge, is_not, le, ne, not_
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 from functools import wraps, partial
 
+from asana_typed.aggregate import Aggregation, Groups, aggregate, group_key
+from asana_typed.index import index_kinds
+from asana_typed.instrumentation import span
+from asana_typed.query_cache import QueryCache
+
 
 def str_to_attrgetter(__function=None, classed=True, position=0):
     """
@@ -74,106 +87,683 @@ def str_contains(attribute, pat, case=True, flags=0, regex=True):
     return f
 
 
+def str_contains_any(attribute, patterns, case=False, regex=False):
+    """
+    Return lambda function whether any of the patterns is contained in each string. Many literal patterns
+    are combined into one regular expression, so every string is scanned once whatever their number.
+    Parameters
+    ----------
+    patterns : iterable of strings
+        Character sequences or regular expressions
+    case : boolean, default False
+        If True, case sensitive
+    regex : bool, default False
+        If True patterns are regular expressions, otherwise they are matched literally
+    """
+    patterns = list(patterns)
+    if not patterns:
+        return lambda x: False
+    if regex:
+        combined = re.compile('|'.join('(?:{})'.format(pattern) for pattern in patterns), 0 if case else re.IGNORECASE)
+        return lambda x: combined.search(attribute(x)) is not None
+    text = attribute
+    if not case:
+        # re.IGNORECASE leaves the fast literal search of re, casefolded text is matched case sensitively
+        patterns = [pattern.casefold() for pattern in patterns]
+        text = lambda x: attribute(x).casefold()
+    if len(patterns) <= few_patterns:
+        return lambda x: _contains_any(text(x), patterns)
+    # longest first, so a pattern is not shadowed by one of its prefixes
+    combined = re.compile('|'.join(re.escape(pattern) for pattern in sorted(patterns, key=len, reverse=True)))
+    return lambda x: combined.search(text(x)) is not None
+
+
+def _contains_any(text: str, patterns: List[str]) -> bool:
+    for pattern in patterns:
+        if pattern in text:
+            return True
+    return False
+
+
+# up to this many literal patterns are searched one after another, more are combined into one regex
+few_patterns = 4
+
+
+_casefolded = weakref.WeakKeyDictionary()
+
+
+def casefolded(obj: Any, path: str, value: str) -> str:
+    """
+    casefolded value of the attribute path of obj, cached per object as long as the attribute holds the same string
+    """
+    try:
+        folded = _casefolded.get(obj)
+        if folded is None:
+            folded = _casefolded[obj] = {}
+    except TypeError:
+        # not weak referenceable, e.g. __slots__ without __weakref__
+        return value.casefold()
+    entry = folded.get(path)
+    if entry is None or entry[0] is not value:
+        entry = folded[path] = (value, value.casefold())
+    return entry[1]
+
+
+def _casefold_getter(path: str, getter: Callable[[Any], str]) -> Callable[[Any], str]:
+    return lambda x: casefolded(x, path, getter(x))
+
+
+def _identity(x):
+    return x
+
+
+def _has_item(attribute, value, key=None):
+    key = attrgetter(key) if isinstance(key, str) else key
+    if key is None:
+        return lambda x: value in (attribute(x) or ())
+    return lambda x: any(key(item) == value for item in (attribute(x) or ()))
+
+
+_operators = {
+    'eq': lambda attribute, value: lambda x: attribute(x) == value,
+    'ne': lambda attribute, value: lambda x: attribute(x) != value,
+    'lt': lambda attribute, value: lambda x: attribute(x) < value,
+    'le': lambda attribute, value: lambda x: attribute(x) <= value,
+    'gt': lambda attribute, value: lambda x: attribute(x) > value,
+    'ge': lambda attribute, value: lambda x: attribute(x) >= value,
+    'is_set': lambda attribute, value: lambda x: attribute(x) is not None,
+    'is_not_set': lambda attribute, value: lambda x: attribute(x) is None,
+    'is_true': lambda attribute, value: lambda x: attribute(x) is True,
+    'is_false': lambda attribute, value: lambda x: attribute(x) is not True,
+    'contains': lambda attribute, value, **options: str_contains(attribute, value, **options),
+    'contains_any': lambda attribute, value, **options: str_contains_any(attribute, value, **options),
+    'has_item': lambda attribute, value, key=None: _has_item(attribute, value, key),
+}
+
+
+class Predicate(object):
+    """
+    Filter of a Query kept as data, so it can be inspected or pushed down to the api.
+    Calling it evaluates the filter on an object.
+    """
+    __slots__ = ('op', 'path', 'getter', 'value', 'options', 'test', '_function')
+
+    def __init__(self, op: str, attribute: (Callable, str), value: Any = None, **options):
+        """
+        :param op: one of eq, ne, lt, le, gt, ge, is_set, is_not_set, is_true, is_false, contains, contains_any,
+            has_item
+        :param attribute: dotted attribute path or a callable returning the value of an object
+        :param value: operand of the comparison
+        :param options: operator options, e.g. case for contains or key for has_item
+        """
+        if op not in _operators:
+            raise ValueError("Unknown operator {}".format(op))
+        self.op = op
+        self.path = attribute if isinstance(attribute, str) else None
+        self.getter = attrgetter(attribute) if isinstance(attribute, str) else attribute
+        self.value = value
+        self.options = options
+        if self._folds():
+            # literal case insensitive matching compares casefolded text, cached per object
+            folded = value.casefold() if op == 'contains' else tuple(pattern.casefold() for pattern in value)
+            self.test = None
+            self._function = _operators[op](_casefold_getter(self.path, self.getter), folded,
+                                            **dict(options, case=True))
+        else:
+            # test applies the operator to an already read attribute value
+            self.test = _operators[op](_identity, value, **options)
+            self._function = _operators[op](self.getter, value, **options)
+
+    def _folds(self) -> bool:
+        if self.path is None or self.options.get('case', self.op == 'contains'):
+            return False
+        if self.op == 'contains':
+            return self.options.get('regex', True) is False
+        return self.op == 'contains_any' and not self.options.get('regex', False)
+
+    def __call__(self, obj: Any) -> bool:
+        return self._function(obj)
+
+    def spec(self) -> Optional[tuple]:
+        """
+        (op, path, value, options) to rebuild the filter in another process, None if it reads a callable
+        """
+        if self.path is None or any(callable(option) for option in self.options.values()):
+            return None
+        return self.op, self.path, self.value, self.options
+
+    def signature(self) -> Optional[tuple]:
+        """
+        hashable description of the filter, None if it reads a callable or compares an unhashable operand
+        """
+        if self.path is None or any(callable(option) for option in self.options.values()):
+            return None
+        signature = (self.op, self.path, self.value, tuple(sorted(self.options.items())))
+        try:
+            hash(signature)
+        except TypeError:
+            return None
+        return signature
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} {self.path or self.getter} {self.op} {self.value!r}"
+
+
+_inline_operators = {
+    'eq': '{} == {}',
+    'ne': '{} != {}',
+    'lt': '{} < {}',
+    'le': '{} <= {}',
+    'gt': '{} > {}',
+    'ge': '{} >= {}',
+    'is_set': '{} is not None',
+    'is_not_set': '{} is None',
+    'is_true': '{} is True',
+    'is_false': '{} is not True',
+}
+
+
+def _is_attribute_path(path: Optional[str]) -> bool:
+    return path is not None and all(part.isidentifier() and not keyword.iskeyword(part) for part in path.split('.'))
+
+
+def compile_filters(filters: List[Callable[[Any], bool]],
+                    fallback: Optional[Callable[[Any], bool]] = None) -> Callable[[Any], bool]:
+    """
+    fuse filters into a single function: attribute reads of Predicates on plain attribute paths are
+    generated inline and shared between filters, comparison operands become constants and filters
+    are evaluated in order until the first one fails, like all(f(x) for f in filters)
+    :param filters: Predicates or callables
+    :param fallback: called instead when evaluating the filters raises, e.g. the filters in their original
+        order when they were reordered, so an earlier filter still guards a later one
+    :return: function returning whether an object passes every filter
+    """
+    namespace = {}
+    reads = {}
+    indent = '        ' if fallback is not None else '    '
+    lines = ['def fused(x):']
+    if fallback is not None:
+        namespace['_fallback'] = fallback
+        lines.append('    try:')
+
+    def constant(value):
+        if value is None or type(value) in (bool, int, str):
+            return repr(value)
+        name = '_c{}'.format(len(namespace))
+        namespace[name] = value
+        return name
+
+    def read(path):
+        if path not in reads:
+            parts = path.split('.')
+            # start from the longest path already read, e.g. assignee before assignee.gid
+            for i in range(len(parts) - 1, 0, -1):
+                prefix = '.'.join(parts[:i])
+                if prefix in reads:
+                    source = '.'.join([reads[prefix]] + parts[i:])
+                    break
+            else:
+                source = 'x.' + path
+            reads[path] = '_v{}'.format(len(reads))
+            lines.append('{}{} = {}'.format(indent, reads[path], source))
+        return reads[path]
+
+    for f in filters:
+        if not isinstance(f, Predicate) or not _is_attribute_path(f.path):
+            test = '{}(x)'.format(constant(f))
+        elif f.test is None:
+            test = '{}(x)'.format(constant(f))
+        elif f.op in _inline_operators:
+            test = _inline_operators[f.op].format(read(f.path), constant(f.value))
+        else:
+            test = '{}({})'.format(constant(f.test), read(f.path))
+        lines.append('{}if not ({}):'.format(indent, test))
+        lines.append('{}    return False'.format(indent))
+    lines.append('{}return True'.format(indent))
+    if fallback is not None:
+        lines.append('    except Exception:')
+        lines.append('        return _fallback(x)')
+    exec('\n'.join(lines), namespace)
+    return namespace['fused']
+
+
+def order_filters(filters: List[Callable[[Any], bool]], sample: Sequence) -> List[Callable[[Any], bool]]:
+    """
+    order filters so the cheapest ones rejecting the most items run first. Cost and selectivity of every filter
+    are measured on sample, filters are ranked by cost / (1 - selectivity).
+    :param filters: Predicates or callables
+    :param sample: items to measure the filters on
+    :return: filters in evaluation order, the given order if there is nothing to measure
+    """
+    if len(filters) < 2 or not sample:
+        return list(filters)
+    ranks = []
+    for position, f in enumerate(filters):
+        passed = 0
+        start = time.perf_counter()
+        for item in sample:
+            try:
+                passed += bool(f(item))
+            except Exception:
+                # a filter that fails here depends on an earlier one, count it as keeping everything
+                passed += 1
+        cost = time.perf_counter() - start
+        ranks.append((cost / max(1.0 - passed / len(sample), 1e-3), position))
+    return [filters[position] for _, position in sorted(ranks)]
+
+
+def _present(values: List) -> Optional[List[bool]]:
+    # mask of values that are set, None when all are. from_datetime decodes absent dates as datetime.min
+    present = None
+    if None in values:
+        present = list(map(is_not, values, repeat(None)))
+    # a sortable column holds a single type, only datetime columns can hold datetime.min
+    if (present is not None or type(values[0]) is datetime) and datetime.min in values:
+        not_min = map(ne, values, repeat(datetime.min))
+        present = list(not_min) if present is None else list(map(and_, present, not_min))
+    return present
+
+
+def sort_items(items: List, sorters: List[tuple]) -> None:
+    """
+    sort items in place, the first sorter is the primary key. None and datetime.min sort last in either direction.
+    Every sorter is one stable in place pass keyed by its getter, from the least significant to the primary one,
+    items missing the value are moved behind the sorted ones in their current order.
+    :param items: list to sort
+    :param sorters: (attribute getter, ascending) pairs
+    """
+    if len(items) < 2:
+        return
+    for getter, ascending in reversed(sorters):
+        present = _present(list(map(getter, items)))
+        if present is None:
+            items.sort(key=getter, reverse=not ascending)
+            continue
+        missing = list(compress(items, map(not_, present)))
+        items[:] = compress(items, present)
+        items.sort(key=getter, reverse=not ascending)
+        items.extend(missing)
+
+
+# views smaller than this keep the filter order, sampled items measure filters of larger ones
+reorder_threshold = 1000
+reorder_sample_size = 200
+
+# limits above this fully sort the matches, selecting with a heap only pays off for a small k
+top_k_threshold = 10000
+
+
+def top_items(items: Iterable, sorters: List[tuple], n: int) -> List:
+    """
+    the first n items in sort_items order. A bounded heap over the primary key values finds the n-th value,
+    only items up to it are sorted, so the cost is O(N log n) plus sorting the candidates.
+    :param items: iterable of items
+    :param sorters: (attribute getter, ascending) pairs
+    :param n: number of items to keep
+    """
+    if n <= 0:
+        return []
+    items = list(items)
+    getter, ascending = sorters[0]
+    values = list(map(getter, items))
+    present = _present(values) if values else None
+    candidates, candidate_values = items, values
+    if present is not None:
+        candidates, candidate_values = list(compress(items, present)), list(compress(values, present))
+    if len(candidate_values) > n:
+        if ascending:
+            bound = heapq.nsmallest(n, candidate_values)[-1]
+            keep = map(le, candidate_values, repeat(bound))
+        else:
+            bound = heapq.nlargest(n, candidate_values)[-1]
+            keep = map(ge, candidate_values, repeat(bound))
+        candidates = list(compress(candidates, keep))
+    elif present is not None:
+        # not enough items with a value, items missing it fill the rest
+        candidates = items
+    sort_items(candidates, sorters)
+    return candidates[:n]
+
+
+def _group_key(attributes: tuple) -> Callable[[Any], Any]:
+    keys = [group_key(attribute) for attribute in attributes]
+    if len(keys) == 1:
+        return keys[0]
+    return lambda x: tuple([k(x) for k in keys])
+
+
 class Query(object):
     """
-    Generic class that provides typed filtering capabilities
+    Generic class that provides typed filtering capabilities.
+    Any iterable can be queried, iterators and generators are consumed by the first get_list or iter call.
     """
 
-    def __init__(self, _list: List):
+    def __init__(self, _list: Iterable, cache: Optional[QueryCache] = None, reorder: bool = True):
+        """
+        :param _list: items to query
+        :param cache: QueryCache memoising get_list results of queries built from attribute paths and plain values
+        :param reorder: run filters in the order measured cheapest on a sample of the view instead of the order
+            they were added in, results are the same either way
+        """
         self._list = _list
         self._view = _list
+        self._cache = cache
+        self._reorder = reorder
         self._filters = []
         self._sorters = []
+        self._sort_paths = []
         self._sort_direction = []
+        self._offset = 0
+        self._limit = None
+        self._workers = 1
+        self._indexes = {}
+        self._compiled = ((), None)
+
+    @property
+    def filters(self) -> List[Callable[[Any], bool]]:
+        return list(self._filters)
+
+    @property
+    def sorters(self) -> List[tuple]:
+        """(attribute getter, ascending) pairs in the order they were added"""
+        return list(zip(self._sorters, self._sort_direction))
+
+    def signature(self) -> Optional[tuple]:
+        """
+        canonical description of the pending filters, sorters, offset and limit, equal for equivalent queries
+        whatever order the filters were added in. None if a filter or sorter is an arbitrary callable.
+        """
+        filters = [f.signature() if isinstance(f, Predicate) else None for f in self._filters]
+        if None in filters or None in self._sort_paths:
+            return None
+        return frozenset(filters), tuple(zip(self._sort_paths, self._sort_direction)), self._offset, self._limit
 
     def new_view(self) -> 'Query':
-        return Query(self._list)
+        return Query(self._list, self._cache, self._reorder)
 
     def get_list(self, clear=True):
-        view = list(filter(lambda x: all(f(x) for f in self._filters), self._view))
-        if len(self._sorters) == 1:
-            view.sort(key=self._sorters[0])
-        elif len(self._sorters) > 1 & all(self._sort_direction):
-            view.sort(key=lambda x: tuple([f(x) for f in self._sorters]))
-        else:
-            sort_ = view
-            for index, i in enumerate(self._sorters):
-                sort_ = sorted(sort_, key=i, reverse=self._sort_direction[index])
-            view = list(sort_)
+        with span('query.get_list') as s:
+            # iterators can not be cached, they are consumed by the first call
+            signature = self.signature() if self._cache is not None and isinstance(self._view, (list, tuple)) \
+                else None
+            view = self._cache.get(self._view, signature) if signature is not None else None
+            if view is None:
+                view = self._execute()
+                view = view if isinstance(view, list) else list(view)
+                if signature is not None:
+                    self._cache.set(self._view, signature, view)
+            s.count = len(view)
         if clear:
-            self._filters = []
-            self._sorters = []
+            self._clear()
         return view
 
+    def iter(self, clear=True) -> Iterator:
+        """
+        yield matching items as they are read from the underlying iterable. Without sorters nothing is
+        materialised, so filtering a generator runs in constant memory, sorters need every match first.
+        """
+        matches = iter(self._execute())
+        if clear:
+            self._clear()
+        return matches
+
+    def _clear(self) -> None:
+        self._filters = []
+        self._sorters = []
+        self._sort_paths = []
+        self._sort_direction = []
+        self._offset = 0
+        self._limit = None
+
+    def _predicate(self) -> Callable[[Any], bool]:
+        key = (tuple(self._filters), id(self._view), self._reorder)
+        if self._compiled[0] != key:
+            filters = self._ordered_filters()
+            fallback = compile_filters(self._filters) if filters != self._filters else None
+            self._compiled = (key, compile_filters(filters, fallback))
+        return self._compiled[1]
+
+    def _ordered_filters(self) -> List[Callable[[Any], bool]]:
+        if not self._reorder or len(self._filters) < 2 or not isinstance(self._view, (list, tuple)) \
+                or len(self._view) < reorder_threshold:
+            return self._filters
+        # a fixed seed keeps the chosen order stable between runs over the same view
+        positions = random.Random(0).sample(range(len(self._view)), min(reorder_sample_size, len(self._view)))
+        return order_filters(self._filters, [self._view[i] for i in positions])
+
+    def _execute(self, ordered: bool = True) -> Iterable:
+        """
+        matching items, lazily unless sorters are set
+        :param ordered: False skips sorting unless a limit or offset picks the items by their order
+        """
+        stop = None if self._limit is None else self._offset + self._limit
+        positions = self._plan()
+        if positions is not None:
+            matches = filter(self._predicate(), map(self._view.__getitem__, positions))
+        else:
+            matches = self._parallel_matches(stop) if self._workers > 1 else None
+            if matches is None:
+                matches = filter(self._predicate(), self._view) if self._filters else self._view
+        if not self._sorters or (not ordered and stop is None and not self._offset):
+            # stops reading once enough items matched
+            return islice(matches, self._offset, stop)
+        if stop is not None and stop <= top_k_threshold:
+            return top_items(matches, self.sorters, stop)[self._offset:]
+        view = list(matches)
+        sort_items(view, self.sorters)
+        return view[self._offset:stop]
+
+    def _parallel_matches(self, stop: Optional[int]) -> Optional[List]:
+        # parallel imports this module
+        from asana_typed.parallel import parallel_matches, parallel_threshold
+        if not self._filters or not isinstance(self._view, (list, tuple)) or len(self._view) < parallel_threshold:
+            return None
+        sort_specs = None
+        if self._sorters and None not in self._sort_paths and (stop is None or stop > top_k_threshold):
+            # chunks come back as sorted runs, the final sort merges them
+            sort_specs = list(zip(self._sort_paths, self._sort_direction))
+        return parallel_matches(self._view, self._filters, sort_specs, self._workers)
+
+    def parallel(self, workers: Optional[int] = None):
+        """
+        filter views of at least parallel_threshold items in chunks on a pool of processes, or of threads when a
+        filter is an arbitrary callable or Python runs without the GIL. Results keep their order.
+        :param workers: pool size, defaults to the number of cpus, 1 runs in the calling thread
+        """
+        self._workers = workers or os.cpu_count() or 1
+        return self
+
+    def _plan(self) -> Optional[List[int]]:
+        """positions of the smallest candidate set an index returns for the filters, None to scan the view"""
+        best, best_count = None, None
+        for f in self._filters:
+            if not self._indexes or not isinstance(f, Predicate):
+                continue
+            for kind in index_kinds:
+                index = self._indexes.get((f.path, kind))
+                if index is None or f.op not in index.operators:
+                    continue
+                if not index.current(self._view):
+                    # items were added to or removed from the view since the index was built
+                    index.build(self._view)
+                count = index.count(f.op, f.value)
+                if count is not None and (best_count is None or count < best_count):
+                    best, best_count = (index, f), count
+        # sorting and reading back a large share of the view costs more than scanning it
+        if best is None or best_count > len(self._view) // 4:
+            return None
+        index, f = best
+        return index.lookup(f.op, f.value)
+
+    def create_index(self, attribute: str, kind: str = 'hash'):
+        """
+        index a dotted attribute of the view, get_list then looks up candidates instead of scanning.
+        Hash indexes answer equals, sorted indexes equals and less_than / greater_than. Every filter is still
+        applied to the candidates, so results and errors are the same as without the index. Indexes are rebuilt
+        by set_view and data_changed, and before a lookup once the length of the view changed; call data_changed
+        after replacing items or modifying them in place.
+        :param attribute: dotted attribute path, e.g. assignee.gid
+        :param kind: hash or sorted
+        """
+        if kind not in index_kinds:
+            raise ValueError("kind must be one of {}".format(', '.join(index_kinds)))
+        if not isinstance(self._view, (list, tuple)):
+            self._view = list(self._view)
+        index = index_kinds[kind](attribute)
+        index.build(self._view)
+        self._indexes[attribute, kind] = index
+        return self
+
+    def limit(self, count: int):
+        """
+        keep at most count items, sorted queries select them with a heap instead of sorting every match
+        """
+        if count < 0:
+            raise ValueError("limit can not be negative")
+        self._limit = count
+        return self
+
+    def offset(self, count: int):
+        """
+        skip the first count items
+        """
+        if count < 0:
+            raise ValueError("offset can not be negative")
+        self._offset = count
+        return self
+
+    def first(self, clear=True) -> Optional[Any]:
+        """
+        first matching item in sort order, or None
+        """
+        limit = self._limit
+        self._limit = 1 if limit is None else min(limit, 1)
+        try:
+            items = self.get_list(clear)
+        finally:
+            if not clear:
+                self._limit = limit
+        return items[0] if items else None
+
+    def exists(self, clear=True) -> bool:
+        """
+        whether any item matches, stops at the first match
+        """
+        found = any(map(self._predicate(), self._view)) if self._filters else any(True for _ in self._view)
+        if clear:
+            self._clear()
+        return found
+
     def set_view(self):
         view = self.get_list(True)
+        if self._cache is not None:
+            self._cache.invalidate(self._view)
         self._view = list(view)
+        for index in self._indexes.values():
+            index.build(self._view)
         return self._view
 
-    @str_to_attrgetter
-    def group_by(self, attribute: (attrgetter, str)):
-        item_list = self.get_list(clear=False)
-        group_map = {}
-        for item in item_list:
-            index = attribute(item)
-            items = group_map.get(index, [])
-            items.append(item)
-            group_map[index] = items
-        return group_map
-
-    @str_to_attrgetter
-    def equals(self, attribute: (attrgetter, str), value):
-        self._filters.append(lambda x: attribute(x) == value)
+    def data_changed(self) -> None:
+        """
+        call after the items of the view were modified in place, rebuilds indexes and drops cached results
+        """
+        if self._cache is not None:
+            self._cache.invalidate(self._view)
+        for index in self._indexes.values():
+            index.build(self._view)
+
+    def group_by(self, *attributes: (attrgetter, str)) -> Groups:
+        """
+        group the matching items by one or more dotted attributes or callables, several form a tuple key.
+        The query is not cleared.
+        :return: dict of group key to items, with agg to aggregate every group
+        """
+        return Groups(self.get_list(clear=False), _group_key(attributes))
+
+    def count(self, clear=True) -> int:
+        total = sum(1 for _ in self._execute(ordered=False))
+        if clear:
+            self._clear()
+        return total
+
+    def aggregate(self, clear=True, by: Any = None, **aggregations: Aggregation) -> Dict[Any, Any]:
+        """
+        compute aggregations over the matching items in a single pass,
+        e.g. aggregate(tasks='count', latest=('max', 'modified_at'))
+        :param by: dotted attribute, callable or tuple of them to aggregate every group separately without
+            collecting its members, e.g. aggregate(by='assignee.gid', tasks='count')
+        :return: aggregation name to value, or group key to aggregation name to value when by is given
+        """
+        if by is None:
+            result = aggregate(self._execute(ordered=False), aggregations)[None]
+        else:
+            key = _group_key(by if isinstance(by, tuple) else (by,))
+            result = aggregate(self._execute(ordered=False), aggregations, key)
+        if clear:
+            self._clear()
+        return result
+
+    def sum(self, attribute: (attrgetter, str), clear=True):
+        return self.aggregate(clear, value=('sum', attribute))['value']
+
+    def min(self, attribute: (attrgetter, str), clear=True):
+        return self.aggregate(clear, value=('min', attribute))['value']
+
+    def max(self, attribute: (attrgetter, str), clear=True):
+        return self.aggregate(clear, value=('max', attribute))['value']
+
+    def mean(self, attribute: (attrgetter, str), clear=True):
+        return self.aggregate(clear, value=('mean', attribute))['value']
+
+    def where(self, predicate: Callable[[Any], bool]):
+        """
+        add a Predicate or any callable returning whether an object is kept
+        """
+        self._filters.append(predicate)
         return self
 
-    @str_to_attrgetter
+    def equals(self, attribute: (attrgetter, str), value):
+        return self.where(Predicate('eq', attribute, value))
+
     def not_equals(self, attribute: (attrgetter, str), value):
-        self._filters.append(lambda x: attribute(x) != value)
-        return self
+        return self.where(Predicate('ne', attribute, value))
 
-    @str_to_attrgetter
     def contains(self, attribute: (attrgetter, str), value, **kwargs):
-        self._filters.append(str_contains(attribute, value, **kwargs))
-        return self
+        return self.where(Predicate('contains', attribute, value, **kwargs))
+
+    def contains_any(self, attribute: (attrgetter, str), patterns: Iterable[str], case=False, regex=False):
+        """
+        keep objects whose text contains any of the patterns, scanned once with a combined regular expression
+        """
+        return self.where(Predicate('contains_any', attribute, tuple(patterns), case=case, regex=regex))
+
+    def has_item(self, attribute: (attrgetter, str), value, key: (attrgetter, str) = None):
+        """
+        keep objects whose list attribute holds value, compared against key of every item if given,
+        e.g. has_item('projects', gid, key='gid')
+        """
+        return self.where(Predicate('has_item', attribute, value, key=key))
 
-    @str_to_attrgetter
     def is_set(self, attribute: (attrgetter, str)):
-        self._filters.append(lambda x: attribute(x) is not None)
-        return self
+        return self.where(Predicate('is_set', attribute))
 
-    @str_to_attrgetter
     def is_not_set(self, attribute: (attrgetter, str)):
-        self._filters.append(lambda x: attribute(x) is None)
-        return self
+        return self.where(Predicate('is_not_set', attribute))
 
-    @str_to_attrgetter
     def is_true(self, attribute: (attrgetter, str)):
-        self._filters.append(lambda x: attribute(x) is True)
-        return self
+        return self.where(Predicate('is_true', attribute))
 
-    @str_to_attrgetter
     def is_false(self, attribute: (attrgetter, str)):
-        self._filters.append(lambda x: attribute(x) is not True)
-        return self
+        return self.where(Predicate('is_false', attribute))
 
-    @str_to_attrgetter
     def less_than(self, attribute: (attrgetter, str), value, equal_than=False):
-        if equal_than:
-            self._filters.append(lambda x: attribute(x) <= value)
-            return self
-        self._filters.append(lambda x: attribute(x) < value)
-        return self
+        return self.where(Predicate('le' if equal_than else 'lt', attribute, value))
 
-    @str_to_attrgetter
     def greater_than(self, attribute: (attrgetter, str), value, equal_than=False):
-        if equal_than:
-            self._filters.append(lambda x: attribute(x) >= value)
-            return self
-        self._filters.append(lambda x: attribute(x) > value)
-        return self
+        return self.where(Predicate('ge' if equal_than else 'gt', attribute, value))
 
-    @str_to_attrgetter
     def sort_by(self, attribute: (attrgetter, str), ascending=True):
-        self._sorters.append(attribute)
+        self._sort_paths.append(attribute if isinstance(attribute, str) else None)
+        self._sorters.append(attrgetter(attribute) if isinstance(attribute, str) else attribute)
         self._sort_direction.append(ascending)
         return self
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+
+class QueryCache(object):
+    """
+    Bounded cache of Query results, least recently used entries are dropped first.
+    Entries are keyed by the identity, length and version of the queried view and the query signature, and keep
+    a reference to the view so a recycled id never returns another list's results. Appending or removing items
+    misses the cache. Any other change of the data, replacing an item (l[0] = other) or modifying one in place,
+    is not detected: call invalidate(view), or Query.data_changed, which bumps the view's version.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _key(self, view: Any, signature: Hashable) -> tuple:
+        return id(view), len(view), self.version(view), signature
+
+    def version(self, view: Any) -> int:
+        """
+        version of view, bumped by every invalidate of it
+        """
+        entry = self._versions.get(id(view))
+        return entry[1] if entry is not None and entry[0] is view else 0
+
+    def get(self, view: Any, signature: Hashable) -> Optional[List]:
+        with self._lock:
+            key = self._key(view, signature)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not view:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def set(self, view: Any, signature: Hashable, result: List) -> None:
+        with self._lock:
+            key = self._key(view, signature)
+            self._entries[key] = (view, list(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, view: Any = None) -> None:
+        """
+        drop the results of view and bump its version, or drop the results of every view if not given
+        """
+        with self._lock:
+            if view is None:
+                self._entries.clear()
+                self._versions.clear()
+                return
+            self._versions[id(view)] = (view, self.version(view) + 1)
+            for key in [key for key, entry in self._entries.items() if entry[0] is view]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} entries:{len(self._entries)} hits:{self.hits} misses:{self.misses}"
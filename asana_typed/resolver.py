@@ -0,0 +1,56 @@
+from typing import Any, Dict, Iterable
+
+from asana_typed.asana import Resource
+from asana_typed.batch import fetch_many
+
+REFERENCE_ATTRIBUTES = ('parent', 'projects', 'workspace', 'assignee', 'tags')
+
+
+def collect_references(objects: Iterable[Any], attributes: Iterable[str] = REFERENCE_ATTRIBUTES) -> Dict[str, str]:
+    """
+    gather the compact Resource references held by objects
+    :param objects: decoded objects
+    :param attributes: attributes holding a Resource or a list of Resource
+    :return: gid to resource_type of every reference
+    """
+    attributes = tuple(attributes)
+    references = {}
+    for obj in objects:
+        for attribute in attributes:
+            value = getattr(obj, attribute, None)
+            if value is None:
+                continue
+            if isinstance(value, Resource):
+                references[value.gid] = value.resource_type
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Resource):
+                        references[item.gid] = item.resource_type
+    return references
+
+
+def resolve_references(client, objects: Iterable[Any], attributes: Iterable[str] = REFERENCE_ATTRIBUTES,
+                       max_depth: int = 10, max_workers: int = 8, use_batch_api: bool = True) -> Dict[str, Any]:
+    """
+    resolve the references of objects level by level, every level is fetched in one concurrent round of
+    batch requests so the number of dependent round trips equals the depth of the hierarchy.
+    :param client: asana client
+    :param objects: already decoded objects, e.g. tasks
+    :param attributes: reference attributes followed on every level
+    :param max_depth: maximum number of levels resolved
+    :param max_workers: concurrent requests per level
+    :param use_batch_api: group lookups into /batch requests
+    :return: gid to decoded object, including the given objects
+    """
+    attributes = tuple(attributes)
+    index = {obj.gid: obj for obj in objects}
+    level = list(index.values())
+    for _ in range(max_depth):
+        pending = [(resource_type, gid) for gid, resource_type in collect_references(level, attributes).items()
+                   if gid not in index]
+        if not pending:
+            break
+        level = list(fetch_many(client, pending, max_workers=max_workers, use_batch_api=use_batch_api)
+                     .objects.values())
+        index.update((obj.gid, obj) for obj in level)
+    return index
@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from asana_typed.asana import from_datetime
+from asana_typed.batch import fetch_many
+from asana_typed.hedging import Deadline
+from asana_typed.pagination import paginate
+
+PROBE_FIELDS = ['gid', 'modified_at']
+
+
+def probe_modified_at(client, references: Iterable[tuple], max_workers: int = 8,
+                      deadline: Union[Deadline, float, None] = None) -> Dict[str, Optional[datetime]]:
+    """
+    request only modified_at for many objects through batch requests
+    :param client: asana client
+    :param references: (resource_type, gid) pairs
+    :param max_workers: concurrent batch requests
+    :param deadline: Deadline or budget in seconds, unfinished gids are left out
+    :return: gid to modified_at, gids that failed (e.g. deleted) map to None
+    """
+    result = fetch_many(client, references, max_workers=max_workers, fields=PROBE_FIELDS, decode=False,
+                        deadline=deadline)
+    modified = {gid: from_datetime(data.get('modified_at')) for gid, data in result.objects.items()}
+    modified.update((gid, None) for gid in result.failed)
+    return modified
+
+
+def probe_project_modified_at(client, project_gid: str, page_size: int = 100) -> Dict[str, datetime]:
+    """
+    list modified_at of every task in a project, one request per page of up to 100 tasks
+    """
+    tasks = paginate(client, '/projects/{}/tasks'.format(project_gid), page_size=page_size, fields=PROBE_FIELDS)
+    return {task['gid']: from_datetime(task.get('modified_at')) for task in tasks}
+
+
+def find_stale(client, objects: Iterable[Any], project_gid: Optional[str] = None, max_workers: int = 8,
+               deadline: Union[Deadline, float, None] = None) -> List[Any]:
+    """
+    find the cached objects that changed on the server by comparing modified_at only.
+    Objects without modified_at (stories, users) are never reported.
+    :param client: asana client
+    :param objects: cached Task or Project objects
+    :param project_gid: if all objects are tasks of this project its task listing is probed, 100 tasks per
+        request, instead of batch lookups of 10
+    :param max_workers: concurrent batch requests
+    :param deadline: Deadline or budget in seconds for the batch probes, unprobed objects are not reported
+    :return: objects whose modified_at moved or that no longer exist (or left the project)
+    """
+    cached = [obj for obj in objects if getattr(obj, 'modified_at', None) is not None]
+    if project_gid is not None:
+        modified = probe_project_modified_at(client, project_gid)
+        return [obj for obj in cached if modified.get(obj.gid) != obj.modified_at]
+    modified = probe_modified_at(client, [(obj.resource_type, obj.gid) for obj in cached], max_workers, deadline)
+    return [obj for obj in cached if obj.gid in modified and modified[obj.gid] != obj.modified_at]
@@ -0,0 +1,142 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from asana_typed.asana import Task, task_opt_fields, from_datetime, logger
+from asana_typed.instrumentation import span
+from asana_typed.query import Query, Predicate
+
+
+def _day(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+def _completed(predicate: Predicate) -> Optional[Tuple[str, str]]:
+    if predicate.op in ('is_true', 'is_false'):
+        return 'completed', 'true' if predicate.op == 'is_true' else 'false'
+    if predicate.op == 'eq' and isinstance(predicate.value, bool):
+        return 'completed', 'true' if predicate.value else 'false'
+    return None
+
+
+def _assignee(predicate: Predicate) -> Optional[Tuple[str, str]]:
+    if predicate.op == 'eq' and isinstance(predicate.value, str):
+        return 'assignee.any', predicate.value
+    return None
+
+
+def _projects(predicate: Predicate) -> Optional[Tuple[str, str]]:
+    if predicate.op == 'has_item' and predicate.options.get('key') == 'gid' and isinstance(predicate.value, str):
+        return 'projects.any', predicate.value
+    return None
+
+
+# date bounds are widened by a day or a second and the predicate is still applied locally,
+# search compares dates in the workspace time zone and its bounds are exclusive.
+# Upper bounds on due_on stay local: a task without a due date decodes as datetime.min and matches them,
+# while due_on.before drops it on the server.
+def _due_on(predicate: Predicate) -> Optional[Tuple[str, str]]:
+    day = _day(predicate.value)
+    if day is None:
+        return None
+    if predicate.op == 'eq':
+        return 'due_on', day.isoformat()
+    if predicate.op in ('gt', 'ge'):
+        return 'due_on.after', (day - timedelta(days=1)).isoformat()
+    return None
+
+
+def _modified_at(predicate: Predicate) -> Optional[Tuple[str, str]]:
+    if not isinstance(predicate.value, datetime):
+        return None
+    if predicate.op in ('lt', 'le'):
+        return 'modified_at.before', (predicate.value + timedelta(seconds=1)).isoformat()
+    if predicate.op in ('gt', 'ge'):
+        return 'modified_at.after', (predicate.value - timedelta(seconds=1)).isoformat()
+    return None
+
+
+# attribute path -> (translation to a search parameter, whether the server applies it exactly)
+search_translations: Dict[str, Tuple[Callable[[Predicate], Optional[Tuple[str, str]]], bool]] = {
+    'completed': (_completed, True),
+    'assignee.gid': (_assignee, True),
+    'projects': (_projects, True),
+    'due_on': (_due_on, False),
+    'modified_at': (_modified_at, False),
+}
+
+
+def compile_search(filters: List[Callable[[Any], bool]]) -> Tuple[Dict[str, str], List[Callable[[Any], bool]]]:
+    """
+    translate the filters of a Query into workspace task search parameters
+    :param filters: Predicates or callables, as returned by Query.filters
+    :return: search parameters and the filters that still have to be applied locally
+    """
+    params = {}
+    local = []
+    for predicate in filters:
+        translation = search_translations.get(getattr(predicate, 'path', None))
+        compiled = translation[0](predicate) if translation is not None else None
+        if compiled is None or compiled[0] in params:
+            local.append(predicate)
+            continue
+        params[compiled[0]] = compiled[1]
+        if not translation[1]:
+            local.append(predicate)
+    return params, local
+
+
+def iter_search(client, workspace_gid: str, params: Dict[str, str], page_size: int = 100,
+                fields: Optional[List[str]] = None) -> Iterator[dict]:
+    """
+    page through workspace task search results. The search api has no offsets, results are sorted by
+    created_at and every page asks for tasks created before the oldest one seen so far.
+    """
+    path = '/workspaces/{}/tasks/search'.format(workspace_gid)
+    fields = list(fields or task_opt_fields)
+    if 'created_at' not in fields:
+        fields.append('created_at')
+    params = dict(params, sort_by='created_at', sort_ascending='false', limit=page_size)
+    seen = set()
+    while True:
+        with span('fetch.search') as s:
+            page = client.get(path, params, fields=fields)
+            s.count = len(page)
+        fresh = [task for task in page if task['gid'] not in seen]
+        for task in fresh:
+            seen.add(task['gid'])
+            yield task
+        if len(page) < page_size:
+            return
+        oldest = min(from_datetime(task['created_at']) for task in page)
+        if fresh:
+            # the bound is exclusive, stay inclusive of the oldest timestamp so ties are not skipped
+            oldest += timedelta(milliseconds=1)
+        else:
+            logger.warning("More than %s tasks created at %s, skipping the rest of them", page_size, oldest)
+        params['created_at.before'] = oldest.isoformat()
+
+
+def search_tasks(client, workspace_gid: str, query: Query, page_size: int = 100) -> List[Task]:
+    """
+    run a Query against the workspace task search api: filters on completed, assignee.gid, projects
+    (has_item with key='gid'), due_on and modified_at are sent to the server, only matching tasks are
+    downloaded and the remaining filters and sorters are applied locally. Upper bounds on due_on are only
+    applied locally, so tasks without a due date match them as they do in a local Query.
+    The items of query are ignored.
+    :param client: asana client
+    :param workspace_gid: workspace to search
+    :param query: Query holding the filters and sorters
+    :param page_size: tasks per search request, at most 100
+    :return: matching tasks
+    """
+    params, local = compile_search(query.filters)
+    tasks = Query([Task.from_dict(task) for task in iter_search(client, workspace_gid, params, page_size)])
+    for predicate in local:
+        tasks.where(predicate)
+    for attribute, ascending in query.sorters:
+        tasks.sort_by(attribute, ascending)
+    return tasks.get_list()
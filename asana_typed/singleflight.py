@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from asana_typed.hedging import DeadlineExceeded
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent calls across threads: the first caller for a key runs the function,
+    callers arriving while it is in flight wait for and share its result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, function: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if leader:
+            self._run(key, call, function, args, kwargs)
+        else:
+            call.event.wait()
+        return self._outcome(call)
+
+    def do_within(self, key: Hashable, timeout: Optional[float], function: Callable[..., Any], *args,
+                  **kwargs) -> Any:
+        """
+        like do, but every caller gives up after its own timeout seconds. The call runs on a separate thread
+        so it is never bounded by a caller's timeout and the other callers keep waiting on it.
+        """
+        if timeout is None:
+            return self.do(key, function, *args, **kwargs)
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                threading.Thread(target=self._run, args=(key, call, function, args, kwargs),
+                                 name='singleflight', daemon=True).start()
+        if not call.event.wait(max(timeout, 0)):
+            raise DeadlineExceeded("Deadline passed while waiting on an in flight call")
+        return self._outcome(call)
+
+    def _run(self, key: Hashable, call: _Call, function: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    @staticmethod
+    def _outcome(call: _Call) -> Any:
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight(object):
+    """
+    asyncio counterpart of SingleFlight, in flight calls are tracked per event loop
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key: Hashable, function: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        loop = asyncio.get_event_loop()
+        calls = self._calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is None:
+            future = calls[key] = asyncio.ensure_future(function(*args, **kwargs))
+            future.add_done_callback(lambda f: calls.pop(key, None))
+        # a cancelled waiter must not cancel the call the other waiters share
+        return await asyncio.shield(future)
@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import dateutil.parser
+
+from asana_typed.asana import resolve_resource_type
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    gid TEXT PRIMARY KEY,
+    resource_type TEXT NOT NULL,
+    modified_at TEXT,
+    assignee_gid TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_resource_type ON objects (resource_type);
+CREATE INDEX IF NOT EXISTS objects_assignee ON objects (assignee_gid);
+CREATE TABLE IF NOT EXISTS project_tasks (
+    project_gid TEXT NOT NULL,
+    task_gid TEXT NOT NULL,
+    PRIMARY KEY (project_gid, task_gid)
+);
+CREATE INDEX IF NOT EXISTS project_tasks_task ON project_tasks (task_gid);
+CREATE TABLE IF NOT EXISTS story_marks (
+    task_gid TEXT PRIMARY KEY,
+    story_gid TEXT,
+    created_at TEXT,
+    task_modified_at TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_tokens (
+    resource_gid TEXT PRIMARY KEY,
+    token TEXT NOT NULL
+);
+"""
+
+
+def _modified_at(obj) -> Optional[str]:
+    value = getattr(obj, 'modified_at', None) or getattr(obj, 'created_at', None)
+    if isinstance(value, datetime) and value != datetime.min:
+        return value.isoformat()
+    return None
+
+
+class LocalStore(object):
+    """
+    SQLite mirror of decoded objects, keyed by gid and remembering each object's modified_at
+    so repeat runs only have to fetch what changed.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        :param path: sqlite database file, defaults to an in-memory database
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> 'LocalStore':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def save(self, objects: Iterable[Any]) -> int:
+        """
+        upsert decoded objects in a single transaction
+        :param objects: Task, Project, Story, User or any registered model
+        :return: number of saved objects
+        """
+        rows = []
+        memberships = []
+        task_gids = []
+        for obj in objects:
+            assignee = getattr(obj, 'assignee', None)
+            rows.append((obj.gid, obj.resource_type, _modified_at(obj),
+                         assignee.gid if assignee is not None else None, json.dumps(obj.to_dict())))
+            if obj.resource_type == 'task':
+                task_gids.append((obj.gid,))
+                memberships.extend((project.gid, obj.gid) for project in obj.projects or [])
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)", rows)
+            self._connection.executemany("DELETE FROM project_tasks WHERE task_gid = ?", task_gids)
+            self._connection.executemany("INSERT OR IGNORE INTO project_tasks VALUES (?, ?)", memberships)
+        return len(rows)
+
+    def delete(self, gids: Iterable[str]) -> None:
+        params = [(gid,) for gid in gids]
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM objects WHERE gid = ?", params)
+            self._connection.executemany("DELETE FROM project_tasks WHERE task_gid = ?", params)
+
+    def _select(self, sql: str, params: Iterable = ()) -> List[Any]:
+        with self._lock:
+            rows = self._connection.execute(sql, tuple(params)).fetchall()
+        return [resolve_resource_type(resource_type)[1].from_dict(json.loads(data)) for resource_type, data in rows]
+
+    def get(self, gid: str) -> Optional[Any]:
+        found = self._select("SELECT resource_type, data FROM objects WHERE gid = ?", (gid,))
+        return found[0] if found else None
+
+    def get_many(self, gids: Iterable[str]) -> Dict[str, Any]:
+        gids = list(gids)
+        found = {}
+        # stay below sqlite's default limit of host parameters
+        for start in range(0, len(gids), 500):
+            chunk = gids[start:start + 500]
+            sql = "SELECT resource_type, data FROM objects WHERE gid IN ({})".format(','.join('?' * len(chunk)))
+            for obj in self._select(sql, chunk):
+                found[obj.gid] = obj
+        return found
+
+    def all(self, resource_type: str) -> List[Any]:
+        return self._select("SELECT resource_type, data FROM objects WHERE resource_type = ?", (resource_type,))
+
+    def tasks_in_project(self, project_gid: str) -> List[Any]:
+        return self._select("SELECT o.resource_type, o.data FROM project_tasks p JOIN objects o ON o.gid = p.task_gid "
+                            "WHERE p.project_gid = ?", (project_gid,))
+
+    def tasks_for_assignee(self, assignee_gid: str) -> List[Any]:
+        return self._select("SELECT resource_type, data FROM objects WHERE resource_type = 'task' "
+                            "AND assignee_gid = ?", (assignee_gid,))
+
+    def modified_at(self, gids: Iterable[str]) -> Dict[str, Optional[datetime]]:
+        """
+        :return: stored modified_at per gid, gids that are not stored are left out
+        """
+        gids = list(gids)
+        found = {}
+        with self._lock:
+            for start in range(0, len(gids), 500):
+                chunk = gids[start:start + 500]
+                sql = "SELECT gid, modified_at FROM objects WHERE gid IN ({})".format(','.join('?' * len(chunk)))
+                for gid, value in self._connection.execute(sql, chunk):
+                    found[gid] = dateutil.parser.parse(value) if value else None
+        return found
+
+    def changed(self, modified: Dict[str, datetime]) -> List[str]:
+        """
+        compare fresh modified_at values against the stored ones
+        :param modified: gid to modified_at as reported by the api
+        :return: gids that are missing locally or whose modified_at moved
+        """
+        stored = self.modified_at(modified.keys())
+        return [gid for gid, value in modified.items() if gid not in stored or stored[gid] != value]
+
+    def get_sync_token(self, resource_gid: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT token FROM sync_tokens WHERE resource_gid = ?",
+                                           (resource_gid,)).fetchone()
+        return row[0] if row else None
+
+    def set_sync_token(self, resource_gid: str, token: Optional[str]) -> None:
+        with self._lock, self._connection:
+            if token is None:
+                self._connection.execute("DELETE FROM sync_tokens WHERE resource_gid = ?", (resource_gid,))
+            else:
+                self._connection.execute("INSERT OR REPLACE INTO sync_tokens VALUES (?, ?)", (resource_gid, token))
+
+    def get_story_mark(self, task_gid: str) -> Optional[Tuple[Optional[str], Optional[datetime], Optional[datetime]]]:
+        """
+        :return: (newest story gid, its created_at, task modified_at) recorded for the task
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT story_gid, created_at, task_modified_at FROM story_marks "
+                                           "WHERE task_gid = ?", (task_gid,)).fetchone()
+        if row is None:
+            return None
+        story_gid, created_at, task_modified_at = row
+        return (story_gid, dateutil.parser.parse(created_at) if created_at else None,
+                dateutil.parser.parse(task_modified_at) if task_modified_at else None)
+
+    def set_story_mark(self, task_gid: str, story_gid: Optional[str], created_at: Optional[datetime],
+                       task_modified_at: Optional[datetime]) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO story_marks VALUES (?, ?, ?, ?)",
+                                     (task_gid, story_gid, created_at.isoformat() if created_at else None,
+                                      task_modified_at.isoformat() if task_modified_at else None))
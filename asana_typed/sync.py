@@ -0,0 +1,205 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from asana_typed.asana import fetch_resource
+
+
+class SyncTokenExpired(Exception):
+    """
+    Raised by an event source when no sync token was given or the given one is too old.
+    Carries the fresh token the next poll should start from.
+    """
+
+    def __init__(self, sync_token: Optional[str]):
+        super(SyncTokenExpired, self).__init__("Sync token invalid or too old")
+        self.sync_token = sync_token
+
+
+class AsanaEventSource(object):
+    """
+    Event source reading the /events endpoint of a python-asana client
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def poll(self, resource_gid: str, sync_token: Optional[str]) -> Tuple[List[dict], str]:
+        """
+        :return: every event since sync_token and the token to continue from
+        """
+        events = []
+        while True:
+            params = {'resource': resource_gid}
+            if sync_token is not None:
+                params['sync'] = sync_token
+            try:
+                result = self.client.events.get(params)
+            except Exception as e:
+                # python-asana raises InvalidTokenError (412) carrying a fresh token
+                if getattr(e, 'status', None) != 412:
+                    raise
+                raise SyncTokenExpired(getattr(e, 'sync', None))
+            events.extend(result.get('data') or [])
+            sync_token = result['sync']
+            if not result.get('has_more'):
+                return events, sync_token
+
+
+class FakeEventSource(object):
+    """
+    In-memory event source for tests, tokens are "generation:position" in a per resource event log
+    """
+
+    def __init__(self):
+        self._events: Dict[str, List[dict]] = {}
+        self._generation: Dict[str, int] = {}
+
+    def emit(self, resource_gid: str, resource_type: str, gid: str, action: str = 'changed') -> None:
+        self._events.setdefault(resource_gid, []).append(
+            {'action': action, 'resource': {'gid': gid, 'resource_type': resource_type}})
+
+    def expire(self, resource_gid: str) -> None:
+        """invalidate every token handed out so far for resource_gid"""
+        self._generation[resource_gid] = self._generation.get(resource_gid, 0) + 1
+
+    def poll(self, resource_gid: str, sync_token: Optional[str]) -> Tuple[List[dict], str]:
+        log = self._events.get(resource_gid, [])
+        generation = self._generation.get(resource_gid, 0)
+        fresh_token = f"{generation}:{len(log)}"
+        if sync_token is None:
+            raise SyncTokenExpired(fresh_token)
+        token_generation, position = map(int, sync_token.split(':'))
+        if token_generation != generation or position > len(log):
+            raise SyncTokenExpired(fresh_token)
+        return log[position:], fresh_token
+
+
+class MemoryMirror(object):
+    """
+    Dictionary mirror with the same save/delete/sync token interface as LocalStore,
+    sync tokens are written to token_path if given so restarts resume.
+    """
+
+    def __init__(self, token_path: Optional[str] = None):
+        self.objects: Dict[str, Any] = {}
+        self.token_path = token_path
+        self._tokens: Dict[str, str] = {}
+        if token_path is not None and os.path.exists(token_path):
+            with open(token_path, 'r') as f:
+                self._tokens = json.load(f)
+
+    def save(self, objects: Iterable[Any]) -> int:
+        count = 0
+        for obj in objects:
+            self.objects[obj.gid] = obj
+            count += 1
+        return count
+
+    def delete(self, gids: Iterable[str]) -> None:
+        for gid in gids:
+            self.objects.pop(gid, None)
+
+    def get(self, gid: str) -> Optional[Any]:
+        return self.objects.get(gid)
+
+    def get_sync_token(self, resource_gid: str) -> Optional[str]:
+        return self._tokens.get(resource_gid)
+
+    def set_sync_token(self, resource_gid: str, token: Optional[str]) -> None:
+        if token is None:
+            self._tokens.pop(resource_gid, None)
+        else:
+            self._tokens[resource_gid] = token
+        if self.token_path is not None:
+            with open(self.token_path, 'w') as f:
+                json.dump(self._tokens, f)
+
+
+class SyncResult(object):
+
+    def __init__(self, changed: List[Any], deleted: List[str], resync_required: bool):
+        self.changed = changed
+        self.deleted = deleted
+        self.resync_required = resync_required
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} changed:{len(self.changed)} deleted:{len(self.deleted)} " \
+               f"resync_required:{self.resync_required}"
+
+
+class SyncEngine(object):
+    """
+    Keeps a mirror up to date from the event stream of a project or workspace.
+    Only the gids named in new events are re-fetched and decoded.
+    """
+
+    def __init__(self, client, source, mirror, resource_gid: str,
+                 resource_types: Iterable[str] = ('task', 'story', 'project'), max_workers: int = 8,
+                 fetch: Callable[[Any, str, str], Any] = fetch_resource):
+        """
+        :param client: asana client handed to fetch
+        :param source: event source, AsanaEventSource or FakeEventSource
+        :param mirror: LocalStore, MemoryMirror or anything with save, delete and the sync token methods
+        :param resource_gid: project or workspace gid whose events are followed
+        :param resource_types: resource types applied to the mirror, other events are ignored
+        :param max_workers: concurrent re-fetches
+        :param fetch: callable (client, resource_type, gid) returning the decoded object
+        """
+        self.client = client
+        self.source = source
+        self.mirror = mirror
+        self.resource_gid = resource_gid
+        self.resource_types = set(resource_types)
+        self.max_workers = max_workers
+        self.fetch = fetch
+
+    def sync(self) -> SyncResult:
+        """
+        pull new events and apply them to the mirror, the token is only stored after the mirror was updated.
+        If resync_required is set the stream could not be resumed and the mirror needs a full load.
+        """
+        try:
+            events, token = self.source.poll(self.resource_gid, self.mirror.get_sync_token(self.resource_gid))
+        except SyncTokenExpired as e:
+            self.mirror.set_sync_token(self.resource_gid, e.sync_token)
+            return SyncResult([], [], True)
+        changed, deleted = self._collapse(events)
+        fetched, missing = self._fetch_all(changed)
+        deleted.extend(missing)
+        self.mirror.save(fetched)
+        self.mirror.delete(deleted)
+        self.mirror.set_sync_token(self.resource_gid, token)
+        return SyncResult(fetched, deleted, False)
+
+    def _collapse(self, events: List[dict]) -> Tuple[Dict[str, str], List[str]]:
+        # the last event per gid decides whether it is re-fetched or deleted
+        latest: Dict[str, Tuple[str, str]] = {}
+        for event in events:
+            resource = event.get('resource') or {}
+            resource_type = resource.get('resource_type')
+            if resource_type not in self.resource_types:
+                continue
+            latest[resource['gid']] = (resource_type, event.get('action'))
+        changed = {gid: resource_type for gid, (resource_type, action) in latest.items() if action != 'deleted'}
+        deleted = [gid for gid, (resource_type, action) in latest.items() if action == 'deleted']
+        return changed, deleted
+
+    def _fetch_one(self, gid: str, resource_type: str):
+        try:
+            return self.fetch(self.client, resource_type, gid)
+        except Exception as e:
+            # deleted between the event and the fetch
+            if getattr(e, 'status', None) == 404:
+                return None
+            raise
+
+    def _fetch_all(self, changed: Dict[str, str]) -> Tuple[List[Any], List[str]]:
+        if not changed:
+            return [], []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._fetch_one, changed.keys(), changed.values()))
+        fetched = [obj for obj in results if obj is not None]
+        missing = [gid for gid, obj in zip(changed.keys(), results) if obj is None]
+        return fetched, missing
@@ -0,0 +1,46 @@
+"""
+Fetch layer throughput against the local fake Asana server at different concurrency levels.
+
+    python -m benchmarks.fetch_concurrency --tasks 400 --latency 0.02
+"""
+import argparse
+import time
+
+import asana
+
+from asana_typed.batch import fetch_many
+from asana_typed.fake_server import FakeAsanaServer, FakeWorkspace
+
+
+def run(client, gids, workers, use_batch_api):
+    start = time.perf_counter()
+    result = fetch_many(client, [('task', gid) for gid in gids], max_workers=workers, use_batch_api=use_batch_api)
+    elapsed = time.perf_counter() - start
+    assert len(result.objects) == len(gids), result
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every response')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    workspace = FakeWorkspace(projects=1, tasks_per_project=args.tasks, stories_per_task=0)
+    with FakeAsanaServer(workspace, latency=args.latency, rate_limit_fraction=args.rate_limit,
+                         retry_after=0.05) as server:
+        client = asana.Client(base_url=server.url)
+        gids = workspace.project_tasks[workspace.projects[0]['gid']]
+        print('{:>8} {:>12} {:>12} {:>12} {:>12}'.format('workers', 'single s', 'single/s', 'batch s', 'batch/s'))
+        for workers in args.concurrency:
+            single = run(client, gids, workers, False)
+            batch = run(client, gids, workers, True)
+            print('{:>8} {:>12.3f} {:>12.0f} {:>12.3f} {:>12.0f}'.format(workers, single, len(gids) / single,
+                                                                        batch, len(gids) / batch))
+        print('requests served: {}, rate limited: {}'.format(server.requests, server.rate_limited))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Query regex filtering over long texts with parallel chunked execution at different worker counts.
+
+    python -m benchmarks.query_parallel --items 500000 --workers 1 2 4 8
+"""
+import argparse
+import random
+import time
+
+from asana_typed.query import Query
+
+
+class Item(object):
+    __slots__ = ('gid', 'notes', 'number')
+
+    def __init__(self, gid, notes, number):
+        self.gid = gid
+        self.notes = notes
+        self.number = number
+
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'issue', 'crash', 'bug', 'release', 'review', 'deploy']
+
+
+def generate(count, words_per_item, seed=0):
+    rand = random.Random(seed)
+    return [Item(str(i), ' '.join(rand.choice(WORDS) for _ in range(words_per_item)), rand.randint(0, 1000))
+            for i in range(count)]
+
+
+def build(query):
+    return query.contains('notes', r'issue\s+(crash|bug)\s+\w+\s+release', case=False).greater_than('number', 10)
+
+
+def measure(items, workers, sort, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        query = build(Query(items).parallel(workers))
+        if sort:
+            query.sort_by('number', False)
+        start = time.perf_counter()
+        result = query.get_list()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=500000)
+    parser.add_argument('--words', type=int, default=60, help='words of text per item')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    items = generate(args.items, args.words)
+    print('{:>8} {:>12} {:>9} {:>12} {:>9}'.format('workers', 'filter s', 'speedup', 'sorted s', 'speedup'))
+    baseline = None
+    for workers in args.workers:
+        unsorted, unsorted_result = measure(items, workers, False, args.repeat)
+        ordered, ordered_result = measure(items, workers, True, args.repeat)
+        if baseline is None:
+            baseline = (unsorted, ordered, unsorted_result, ordered_result)
+        assert unsorted_result == baseline[2] and ordered_result == baseline[3]
+        print('{:>8} {:>12.3f} {:>9.2f} {:>12.3f} {:>9.2f}'.format(workers, unsorted, baseline[0] / unsorted,
+                                                                  ordered, baseline[1] / ordered))
+
+
+if __name__ == '__main__':
+    main()
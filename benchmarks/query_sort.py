@@ -0,0 +1,77 @@
+"""
+Query multi-key sort against the previous approach of one stable sorted() pass per sorter.
+
+    python -m benchmarks.query_sort --items 200000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from asana_typed.query import Query
+
+
+class Item(object):
+    __slots__ = ('assignee', 'due_on', 'modified_at', 'name')
+
+    def __init__(self, assignee, due_on, modified_at, name):
+        self.assignee = assignee
+        self.due_on = due_on
+        self.modified_at = modified_at
+        self.name = name
+
+
+def generate(count, seed=0):
+    rand = random.Random(seed)
+    start = datetime(2019, 1, 1)
+    return [Item('user{}'.format(rand.randint(0, 50)),
+                 datetime.min if rand.random() < 0.2 else start + timedelta(days=rand.randint(0, 365)),
+                 start + timedelta(seconds=rand.randint(0, 10 ** 7)), 'Task {}'.format(i)) for i in range(count)]
+
+
+def chained(items, sorters):
+    # one full sort per key, least significant key first
+    view = items
+    for attribute, ascending in reversed(sorters):
+        view = sorted(view, key=lambda x, a=attribute: getattr(x, a), reverse=not ascending)
+    return list(view)
+
+
+def engine(items, sorters):
+    query = Query(items)
+    for attribute, ascending in sorters:
+        query.sort_by(attribute, ascending)
+    return query.get_list()
+
+
+def measure(function, items, sorters, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(items, sorters)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    items = generate(args.items)
+    cases = [
+        ('1 key asc', [('modified_at', True)]),
+        ('2 keys asc', [('assignee', True), ('modified_at', True)]),
+        ('2 keys desc', [('assignee', False), ('modified_at', False)]),
+        ('3 keys mixed', [('assignee', True), ('due_on', False), ('modified_at', True)]),
+    ]
+    print('{:>14} {:>12} {:>12} {:>8}'.format('case', 'chained s', 'engine s', 'speedup'))
+    for name, sorters in cases:
+        old = measure(chained, items, sorters, args.repeat)
+        new = measure(engine, items, sorters, args.repeat)
+        print('{:>14} {:>12.3f} {:>12.3f} {:>8.2f}'.format(name, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,23 @@
-import calendar
 import os
 import textwrap
-from datetime import datetime, timedelta
-from email.utils import parsedate, formatdate
+from datetime import datetime
 from typing import List
 from enum import Enum
 
 import asana
 import pytz
-from cachecontrol import CacheControl
-from cachecontrol.caches import FileCache
-from cachecontrol.heuristics import BaseHeuristic
 from dateutil.relativedelta import relativedelta, SA
 
 from asana_typed import Project, Query
 from asana_typed import Task
 from asana_typed.asana import Story
+from asana_typed.cache import conditional_cache, FileCache
+from asana_typed.resolver import resolve_references
 from examples.tree_node import Tree
 
 utc = pytz.UTC
 
 
-class OneWeekHeuristic(BaseHeuristic):
-
-    def update_headers(self, response):
-        date = parsedate(response.headers['date'])
-        expires = datetime(*date[:6]) + timedelta(weeks=1)
-        return {
-            'expires': formatdate(calendar.timegm(expires.timetuple())),
-            'cache-control': 'public',
-        }
-
-    def warning(self, response):
-        msg = 'Automatically cached! Response is Stale.'
-        return '110 - "%s"' % msg
-
-
 def get_last_saturday():
     sat = datetime.now() + relativedelta(weekday=SA(-1))
     return sat + relativedelta(hour=0, second=0, minute=0)
@@ -63,7 +45,7 @@ def comment_to_action(text):
 
 token = os.getenv('ASANA_APP_TOKEN', "")
 auth = asana.Client.access_token(token).session
-sess = CacheControl(auth, cache=FileCache('.webcache'), heuristic=OneWeekHeuristic())
+sess = conditional_cache(auth, cache=FileCache('.webcache'), stale_while_revalidate=300)
 
 client = asana.Client(sess)
 
@@ -84,12 +66,8 @@ for task in tasks[:]:
     if comment_to_action(ptask.notes):
         continue
     tasks_details.append(ptask)
-    stories = list(ptask.fetch_stories(client))
-    if len(stories) > 0:
-        query = Query(stories)
-        sublist = query.equals('type_', 'comment').contains('text', 'ISSUE', case=False).get_list()
-        if len(sublist) > 0:
-            issues = issues + sublist
+    query = Query(ptask.fetch_stories(client))
+    issues.extend(query.equals('type_', 'comment').contains('text', 'ISSUE', case=False).iter())
     if ptask.parent:
         parent = ptask.parent.__fetch__task__(client)
         if ptask.due_on == datetime.min:
@@ -108,18 +86,19 @@ all_items = []
 def ct(task_list):
     tree = Tree()
     tree.create_node("Root", "Root")
+    index = resolve_references(client, task_list, attributes=('parent', 'projects'), max_depth=2)
     for ptask in task_list:
         node_parent = "Root"
         if len(ptask.projects) > 0:
-            project = ptask.projects[0].__fetch__project__(client)
+            project = index[ptask.projects[0].gid]
             if tree.find_index(project.gid) is None:
                 all_items.append(project)
                 tree.create_node(project.name, project.gid, node_parent)
             node_parent = project.gid
         if ptask.parent:
-            parent = ptask.parent.__fetch__task__(client)
+            parent = index[ptask.parent.gid]
             if len(parent.projects) > 0:
-                parent_project = parent.projects[0].__fetch__project__(client)
+                parent_project = index[parent.projects[0].gid]
                 if tree.find_index(parent_project.gid) is None:
                     all_items.append(parent_project)
                     tree.create_node(parent_project.name, parent_project.gid, node_parent)
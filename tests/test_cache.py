@@ -0,0 +1,69 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import requests
+
+from asana_typed.cache import CacheEntry, ConditionalCacheAdapter, FileCache
+from asana_typed.fake_server import FakeAsanaServer, FakeWorkspace
+
+
+class BrokenCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, entry):
+        raise OSError('disk full')
+
+    def delete(self, key):
+        pass
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_concurrent_file_cache_writes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = FileCache(directory.name)
+        errors = []
+
+        def write(i):
+            try:
+                for j in range(100):
+                    cache.set('key', CacheEntry('url', 200, {}, '{}-{}'.format(i, j).encode(), 0.0))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.get('key').body.split(b'-')[1], b'99')
+        self.assertEqual(os.listdir(directory.name), ['key.json'])
+
+    def test_revalidation(self):
+        with FakeAsanaServer(FakeWorkspace(projects=1, tasks_per_project=1)) as server:
+            session = requests.Session()
+            session.mount('http://', ConditionalCacheAdapter())
+            first = session.get(server.url + '/workspaces')
+            second = session.get(server.url + '/workspaces')
+            self.assertFalse(getattr(first, 'from_cache', False))
+            self.assertTrue(second.from_cache)
+            self.assertEqual(first.json(), second.json())
+            self.assertEqual(server.requests, 2)
+
+    def test_storage_errors_do_not_fail_requests(self):
+        with FakeAsanaServer(FakeWorkspace(projects=1, tasks_per_project=1)) as server:
+            session = requests.Session()
+            session.mount('http://', ConditionalCacheAdapter(BrokenCache()))
+            with self.assertLogs('asana_typed.cache', 'WARNING'):
+                response = session.get(server.url + '/workspaces')
+            self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
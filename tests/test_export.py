@@ -0,0 +1,75 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+import asana
+
+from asana_typed.export import WorkspaceExporter
+from asana_typed.fake_server import FakeAsanaServer, FakeWorkspace
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = FakeWorkspace(projects=3, tasks_per_project=5, stories_per_task=1, users=2,
+                                       subtasks_per_task=1, subtask_depth=2, tasks_without_project=2)
+        projects = [project['gid'] for project in self.workspace.projects]
+        # a task living in the first and the last project
+        self.shared = self.workspace.project_tasks[projects[0]][0]
+        self.workspace.project_tasks[projects[2]].append(self.shared)
+        self.server = FakeAsanaServer(self.workspace).start()
+        self.addCleanup(self.server.stop)
+        self.client = asana.Client(base_url=self.server.url)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def exporter(self, format, **kwargs):
+        return WorkspaceExporter(self.client, self.workspace.workspace['gid'], os.path.join(self.directory, 'out'),
+                                 format=format, checkpoint_path=os.path.join(self.directory, 'checkpoint.json'),
+                                 workers=2, **kwargs)
+
+    def records(self, format):
+        opener = gzip.open if format == 'snapshot' else open
+        with opener(os.path.join(self.directory, 'out'), 'rb') as f:
+            return [json.loads(line) for line in f]
+
+    def assertComplete(self, records):
+        tasks = Counter(record['data']['gid'] for record in records if record['type'] == 'task')
+        self.assertEqual(set(tasks), {task['gid'] for task in self.workspace.tasks()})
+        self.assertEqual(max(tasks.values()), 1)
+        projects = [record['data']['gid'] for record in records if record['type'] == 'project']
+        self.assertEqual(sorted(projects), sorted(project['gid'] for project in self.workspace.projects))
+        stories = [record for record in records if record['type'] == 'story']
+        self.assertEqual(len(stories), len(tasks))
+
+    def test_export(self):
+        for format in ('jsonl', 'snapshot'):
+            stats = self.exporter(format).run()
+            self.assertComplete(self.records(format))
+            self.assertEqual(stats.projects, 3)
+            os.remove(os.path.join(self.directory, 'checkpoint.json'))
+
+    def test_resume_after_crash(self):
+        last = self.workspace.projects[2]['gid']
+        failing = [gid for gid in self.workspace.project_tasks[last] if gid != self.shared]
+        for format in ('jsonl', 'snapshot'):
+            # story listings of the last project's tasks answer 404, the export fails after two projects
+            stories = {gid: self.workspace.stories.pop(gid) for gid in failing}
+            with self.assertRaises(Exception):
+                self.exporter(format).run()
+            with open(os.path.join(self.directory, 'checkpoint.json')) as f:
+                self.assertEqual(len(json.load(f)['completed_projects']), 2)
+
+            self.workspace.stories.update(stories)
+            stats = self.exporter(format).run()
+            self.assertEqual(stats.skipped_projects, 2)
+            self.assertComplete(self.records(format))
+            os.remove(os.path.join(self.directory, 'checkpoint.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+
+import asana
+
+from asana_typed.asana import fetch_resource
+from asana_typed.batch import fetch_many
+from asana_typed.fake_server import FakeAsanaServer, FakeWorkspace
+from asana_typed.hedging import DeadlineExceeded
+from asana_typed.singleflight import SingleFlight
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_coalesces_concurrent_calls(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = [None] * 8
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return object()
+
+        def call(i):
+            results[i] = flights.do('key', slow)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(results))]
+        for thread in threads:
+            thread.start()
+        while flights.in_flight() == 0:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_shares_exceptions(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            flights.do('key', fail)
+        self.assertEqual(flights.in_flight(), 0)
+
+
+class FetchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workspace = FakeWorkspace(projects=2, tasks_per_project=20, stories_per_task=0)
+        cls.gids = [task['gid'] for task in cls.workspace.tasks()]
+
+    def serve(self, **kwargs):
+        server = FakeAsanaServer(self.workspace, **kwargs).start()
+        self.addCleanup(server.stop)
+        return server, asana.Client(base_url=server.url)
+
+    def test_concurrent_fetches_share_one_request(self):
+        server, client = self.serve(latency=0.2)
+        results = [None] * 6
+
+        def fetch(i):
+            results[i] = fetch_resource(client, 'task', self.gids[0])
+
+        run_threads(len(results), fetch)
+        self.assertEqual(server.requests, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_deadline_only_bounds_its_caller(self):
+        server, client = self.serve(latency=0.5)
+        outcomes = {}
+
+        def fetch(i):
+            try:
+                outcomes[i] = fetch_resource(client, 'task', self.gids[1], deadline=0.1 if i == 0 else None)
+            except DeadlineExceeded as e:
+                outcomes[i] = e
+
+        run_threads(2, fetch)
+        self.assertIsInstance(outcomes[0], DeadlineExceeded)
+        self.assertEqual(outcomes[1].gid, self.gids[1])
+        self.assertEqual(server.requests, 1)
+
+    def test_fetch_many(self):
+        server, client = self.serve()
+        references = [('task', gid) for gid in self.gids] * 2
+        for use_batch_api in (True, False):
+            result = fetch_many(client, references, use_batch_api=use_batch_api)
+            self.assertEqual(sorted(result.objects), sorted(self.gids))
+            self.assertEqual((result.failed, result.pending), ({}, []))
+
+    def test_fetch_many_reports_failed_and_pending(self):
+        server, client = self.serve()
+        result = fetch_many(client, [('task', self.gids[0]), ('task', 'missing')])
+        self.assertEqual(list(result.objects), [self.gids[0]])
+        self.assertEqual(result.failed, {'missing': 404})
+
+        server, client = self.serve(slow_fraction=0.5, slow_latency=1.0)
+        start = time.monotonic()
+        result = fetch_many(client, [('task', gid) for gid in self.gids], use_batch_api=False, deadline=0.3)
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertTrue(result.objects and result.pending)
+        self.assertEqual(sorted(list(result.objects) + result.pending), sorted(self.gids))
+
+
+if __name__ == '__main__':
+    unittest.main()
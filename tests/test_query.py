@@ -0,0 +1,94 @@
+import threading
+import unittest
+
+from asana_typed.query import Query
+from asana_typed.query_cache import QueryCache
+
+
+class Item(object):
+
+    def __init__(self, n, assignee=None):
+        self.n = n
+        self.assignee = assignee
+
+
+class Assignee(object):
+
+    def __init__(self, gid):
+        self.gid = gid
+
+
+class IndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [Item(i % 50, Assignee(str(i % 10))) for i in range(200)]
+
+    def test_index_matches_scan(self):
+        query = Query(self.items).create_index('n', 'sorted').create_index('assignee.gid')
+        self.assertEqual(query.less_than('n', 3).get_list(), Query(self.items).less_than('n', 3).get_list())
+        self.assertEqual(query.equals('assignee.gid', '4').get_list(),
+                         Query(self.items).equals('assignee.gid', '4').get_list())
+
+    def test_index_follows_appended_items(self):
+        query = Query(self.items).create_index('n', 'sorted').create_index('n', 'hash')
+        self.items.append(Item(-1))
+        self.assertIs(query.less_than('n', 3).get_list()[-1], self.items[-1])
+        self.assertEqual(query.equals('n', -1).get_list(), [self.items[-1]])
+
+    def test_unreadable_path_raises_as_on_scan(self):
+        self.items.append(Item(0))
+        for indexed in (False, True):
+            query = Query(self.items)
+            if indexed:
+                query.create_index('assignee.gid')
+            with self.assertRaises(AttributeError):
+                query.equals('assignee.gid', '4').get_list()
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_cached_results_follow_the_data(self):
+        cache = QueryCache()
+        items = [Item(1), Item(2)]
+        self.assertEqual(len(Query(items, cache).equals('n', 1).get_list()), 1)
+        self.assertEqual(len(Query(items, cache).equals('n', 1).get_list()), 1)
+        self.assertEqual(cache.hits, 1)
+
+        items.append(Item(1))
+        self.assertEqual(len(Query(items, cache).equals('n', 1).get_list()), 2)
+
+        query = Query(items, cache)
+        items[1] = Item(1)
+        query.data_changed()
+        self.assertEqual(cache.version(items), 1)
+        self.assertEqual(len(query.equals('n', 1).get_list()), 3)
+
+
+class ParallelTest(unittest.TestCase):
+
+    def test_parallel_matches_sequential(self):
+        items = [Item(i % 997, Assignee(str(i % 10))) for i in range(30000)]
+        others = [Item(i % 991, Assignee(str(i % 7))) for i in range(12000)]
+
+        def build(query):
+            return query.greater_than('n', 500).equals('assignee.gid', '3').sort_by('n')
+
+        results = {}
+
+        def run(name, view):
+            results[name] = build(Query(view).parallel(2)).get_list() == build(Query(view)).get_list()
+
+        # two parallel queries at once must not see each other's view
+        threads = [threading.Thread(target=run, args=('items', items)),
+                   threading.Thread(target=run, args=('others', others))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {'items': True, 'others': True})
+        run('single', items)
+        self.assertTrue(results['single'])
+
+
+if __name__ == '__main__':
+    unittest.main()
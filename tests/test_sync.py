@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from asana_typed.sync import FakeEventSource, MemoryMirror, SyncEngine
+
+
+class Obj(object):
+
+    def __init__(self, gid, version):
+        self.gid = gid
+        self.version = version
+
+
+class SyncEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.source = FakeEventSource()
+        self.versions = {}
+        self.fetched = []
+
+    def fetch(self, client, resource_type, gid):
+        self.fetched.append(gid)
+        return Obj(gid, self.versions.get(gid, 0))
+
+    def engine(self, mirror):
+        return SyncEngine(None, self.source, mirror, 'project', fetch=self.fetch)
+
+    def test_first_sync_requires_resync(self):
+        mirror = MemoryMirror()
+        result = self.engine(mirror).sync()
+        self.assertTrue(result.resync_required)
+        self.assertIsNotNone(mirror.get_sync_token('project'))
+
+    def test_applies_collapsed_events(self):
+        mirror = MemoryMirror()
+        engine = self.engine(mirror)
+        engine.sync()
+        self.source.emit('project', 'task', '1')
+        self.source.emit('project', 'task', '1')
+        self.source.emit('project', 'task', '2')
+        self.source.emit('project', 'tag', '3')
+        result = engine.sync()
+        self.assertFalse(result.resync_required)
+        self.assertEqual(sorted(self.fetched), ['1', '2'])
+        self.assertEqual(sorted(mirror.objects), ['1', '2'])
+
+        self.source.emit('project', 'task', '2', action='deleted')
+        result = engine.sync()
+        self.assertEqual(result.deleted, ['2'])
+        self.assertEqual(sorted(mirror.objects), ['1'])
+
+    def test_resume_from_stored_token(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'tokens.json')
+        engine = self.engine(MemoryMirror(path))
+        engine.sync()
+        self.source.emit('project', 'task', '1')
+        engine.sync()
+
+        # a restarted engine only sees events emitted after the stored token
+        self.source.emit('project', 'task', '2')
+        self.fetched = []
+        restarted = self.engine(MemoryMirror(path))
+        result = restarted.sync()
+        self.assertFalse(result.resync_required)
+        self.assertEqual(self.fetched, ['2'])
+
+    def test_expired_token(self):
+        mirror = MemoryMirror()
+        engine = self.engine(mirror)
+        engine.sync()
+        self.source.emit('project', 'task', '1')
+        self.source.expire('project')
+        result = engine.sync()
+        self.assertTrue(result.resync_required)
+        self.assertEqual(self.fetched, [])
+
+        # the fresh token handed out with the expiry resumes the stream
+        self.source.emit('project', 'task', '2')
+        result = engine.sync()
+        self.assertFalse(result.resync_required)
+        self.assertEqual(self.fetched, ['2'])
+
+
+if __name__ == '__main__':
+    unittest.main()